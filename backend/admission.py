@@ -0,0 +1,209 @@
+"""Admission control for the routes every student hits when an exam opens.
+
+Each limited route has a concurrency limit and a bounded wait queue: a
+request that finds the queue full, or waits longer than
+``ADMISSION_MAX_WAIT`` for a slot, is answered 503 with ``Retry-After``
+straight away instead of piling up on the event loop and in Mongo. The
+exam-open routes are additionally metered per class through token
+buckets, so one class starting its exam cannot take every slot from the
+others. Login is only limited per route, since the class is not known
+before the credentials are checked.
+
+``AdmissionMiddleware`` sits inside ``MetricsMiddleware``, so rejections
+show up in the per-route response counts, and it records queue depth,
+waits and rejections by reason in metrics of its own.
+"""
+import asyncio
+import math
+import os
+import time
+
+from starlette.responses import JSONResponse
+
+import metrics
+
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'true').lower() in ('1', 'true', 'yes')
+# "METHOD /path=concurrency:queue" per route template, comma separated
+ADMISSION_ROUTE_LIMITS = os.environ.get(
+    'ADMISSION_ROUTE_LIMITS',
+    "POST /api/auth/login=64:256,"
+    "GET /api/exams=128:512,"
+    "POST /api/exams/{exam_id}/start=64:512,"
+    "GET /api/exams/{exam_id}/questions=128:512,"
+    "GET /api/exams/{exam_id}/bundle=128:512"
+)
+ADMISSION_CLASS_ROUTES = os.environ.get(
+    'ADMISSION_CLASS_ROUTES',
+    "GET /api/exams,POST /api/exams/{exam_id}/start,GET /api/exams/{exam_id}/questions,"
+    "GET /api/exams/{exam_id}/bundle"
+)
+ADMISSION_CLASS_RATE = float(os.environ.get('ADMISSION_CLASS_RATE', 50))
+ADMISSION_CLASS_BURST = float(os.environ.get('ADMISSION_CLASS_BURST', 150))
+ADMISSION_MAX_WAIT = float(os.environ.get('ADMISSION_MAX_WAIT', 2.0))
+
+
+def parse_route_limits(spec: str) -> dict:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        route, _, sizes = item.rpartition('=')
+        concurrency, _, queue = sizes.partition(':')
+        limits[route.strip()] = (int(concurrency), int(queue or 0))
+    return limits
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token: 0 when one was available, else the seconds until one will be."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RouteLimit:
+    """At most ``concurrency`` requests in the handler and ``max_queue`` waiting for a slot."""
+
+    def __init__(self, route: str, concurrency: int, max_queue: int):
+        self.route = route
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._semaphore = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0, "class_rate": 0}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running loop, not the import-time one
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def reject(self, reason: str):
+        self.rejected[reason] += 1
+        metrics.admission_rejections.inc(self.route, reason)
+
+    async def acquire(self, max_wait: float) -> bool:
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.reject("queue_full")
+                return False
+            self.waiting += 1
+            metrics.admission_queue_depth.set(self.route, value=self.waiting)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=max_wait)
+            except asyncio.TimeoutError:
+                self.reject("timeout")
+                return False
+            finally:
+                self.waiting -= 1
+                metrics.admission_queue_depth.set(self.route, value=self.waiting)
+            metrics.admission_wait.observe(self.route, value=time.perf_counter() - start)
+        else:
+            await semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionControl:
+    def __init__(self, route_limits: str = ADMISSION_ROUTE_LIMITS, class_routes: str = ADMISSION_CLASS_ROUTES,
+                 class_rate: float = ADMISSION_CLASS_RATE, class_burst: float = ADMISSION_CLASS_BURST,
+                 max_wait: float = ADMISSION_MAX_WAIT, enabled: bool = ADMISSION_CONTROL):
+        self.enabled = enabled
+        self.max_wait = max_wait
+        self.routes = {route: RouteLimit(route, concurrency, queue)
+                       for route, (concurrency, queue) in parse_route_limits(route_limits).items()}
+        self.class_routes = {route.strip() for route in class_routes.split(',') if route.strip()}
+        self.class_rate = class_rate
+        self.class_burst = class_burst
+        self._buckets = {}
+
+    def class_retry_after(self, class_name: str) -> float:
+        bucket = self._buckets.get(class_name)
+        if bucket is None:
+            bucket = self._buckets[class_name] = TokenBucket(self.class_rate, self.class_burst)
+        return bucket.take()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_wait": self.max_wait,
+            "class_rate": self.class_rate,
+            "class_burst": self.class_burst,
+            "routes": {route: limit.stats() for route, limit in self.routes.items()},
+            "class_tokens": {name: round(b.tokens, 1) for name, b in sorted(self._buckets.items())},
+        }
+
+
+def busy_response(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Server busy, please retry"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """``class_of(scope)`` returns the requesting student's class, or None to skip the class bucket."""
+
+    def __init__(self, app, controller: AdmissionControl = None, fastapi_app=None, class_of=None):
+        self.app = app
+        self.controller = controller
+        self.fastapi_app = fastapi_app
+        self.class_of = class_of
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or not controller.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        # MetricsMiddleware has already matched the route template
+        route = metrics.current_route.get() or f"{scope['method']} {metrics.route_template(self.fastapi_app, scope)}"
+        limit = controller.routes.get(route)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if route in controller.class_routes and self.class_of is not None:
+            class_name = self.class_of(scope)
+            if class_name is not None:
+                retry_after = controller.class_retry_after(class_name)
+                if retry_after:
+                    limit.reject("class_rate")
+                    await busy_response(retry_after)(scope, receive, send)
+                    return
+
+        if not await limit.acquire(controller.max_wait):
+            await busy_response(1)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
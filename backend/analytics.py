@@ -0,0 +1,134 @@
+"""School-wide score analytics computed inside MongoDB.
+
+Each report is a single ``$group`` pipeline over graded submissions, so only
+one summary row per student, class or subject crosses the wire. Medians use
+the ``$median`` accumulator (MongoDB 7.0+); on older servers the pipeline
+falls back to pushing each group's percentages and taking the median here.
+"""
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import OperationFailure
+
+PASS_PERCENTAGE = float(os.environ.get('PASS_PERCENTAGE', 70))
+ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', 300))
+
+GROUP_FIELDS = {
+    "student": "$student_id",
+    "class": "$class_name",
+    "subject": "$subject_name",
+}
+
+# "unknown group operator" before 7.0, and QueryFeatureNotAllowed on 7.0 with an older FCV
+MEDIAN_UNSUPPORTED_CODES = {15952, 224}
+
+_cache = {}
+# Flipped off the first time the server rejects $median
+_native_median = True
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _window_match(start: datetime = None, end: datetime = None) -> dict:
+    match = {
+        "status": "graded",
+        "score": {"$type": "number"},
+        "total_points": {"$gt": 0},
+    }
+    window = {}
+    if start:
+        window["$gte"] = _as_utc(start)
+    if end:
+        window["$lt"] = _as_utc(end)
+    if window:
+        match["submitted_at"] = window
+    return match
+
+
+def _pipeline(group_by: str, match: dict, native_median: bool) -> list:
+    group = {
+        "_id": GROUP_FIELDS[group_by],
+        "count": {"$sum": 1},
+        "mean": {"$avg": "$percentage"},
+        "passed": {"$sum": {"$cond": [{"$gte": ["$percentage", PASS_PERCENTAGE]}, 1, 0]}},
+    }
+    if native_median:
+        group["median"] = {"$median": {"input": "$percentage", "method": "approximate"}}
+    else:
+        group["values"] = {"$push": "$percentage"}
+    if group_by == "student":
+        group["student_name"] = {"$first": "$student_name"}
+        group["class_name"] = {"$first": "$class_name"}
+
+    return [
+        {"$match": match},
+        {"$set": {"percentage": {"$multiply": [{"$divide": ["$score", "$total_points"]}, 100]}}},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+async def _run(db, group_by: str, match: dict) -> list:
+    global _native_median
+    if _native_median:
+        try:
+            return await db.student_exams.aggregate(_pipeline(group_by, match, True)).to_list(None)
+        except OperationFailure as e:
+            # Timeouts, interrupts and auth errors must not disable $median for the process
+            if e.code not in MEDIAN_UNSUPPORTED_CODES:
+                raise
+            _native_median = False
+    rows = await db.student_exams.aggregate(_pipeline(group_by, match, False)).to_list(None)
+    for row in rows:
+        row["median"] = statistics.median(row.pop("values"))
+    return rows
+
+
+async def score_summary(db, group_by: str, start: datetime = None, end: datetime = None) -> dict:
+    """Mean, median and pass rate of percentage scores per student, class or subject.
+
+    Results are cached for ANALYTICS_CACHE_TTL seconds per (group_by, window).
+    """
+    key = (group_by, start, end)
+    cached = _cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+
+    rows = await _run(db, group_by, _window_match(start, end))
+    groups = []
+    for row in rows:
+        group = {
+            "key": row.pop("_id"),
+            "count": row["count"],
+            "mean": round(row["mean"], 2),
+            "median": round(row["median"], 2),
+            "pass_rate": round(row["passed"] / row["count"] * 100, 2),
+        }
+        if group_by == "student":
+            group["student_name"] = row.get("student_name")
+            group["class_name"] = row.get("class_name")
+        groups.append(group)
+
+    result = {
+        "group_by": group_by,
+        "start": start,
+        "end": end,
+        "pass_percentage": PASS_PERCENTAGE,
+        "generated_at": datetime.now(timezone.utc),
+        "groups": groups,
+    }
+    for stale in [k for k, (expires, _) in _cache.items() if expires <= now]:
+        del _cache[stale]
+    _cache[key] = (now + ANALYTICS_CACHE_TTL, result)
+    return result
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+
+from pymongo import UpdateOne
+
+AUTOSAVE_FLUSH_INTERVAL = float(os.environ.get('AUTOSAVE_FLUSH_INTERVAL', 2.0))
+AUTOSAVE_MAX_PENDING = int(os.environ.get('AUTOSAVE_MAX_PENDING', 5000))
+# Hard cap on buffered attempts; while Mongo is down failed flushes keep theirs
+AUTOSAVE_MAX_BUFFERED = int(os.environ.get('AUTOSAVE_MAX_BUFFERED', 4 * AUTOSAVE_MAX_PENDING))
+AUTOSAVE_BULK_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class AutosaveBufferFull(Exception):
+    """Raised when a new attempt would push the buffer past ``max_buffered``."""
+
+
+class AutosaveBuffer:
+    """Write-behind buffer for in-progress answers.
+
+    Deltas from every student are merged in memory per attempt, so a
+    student changing the same answer ten times between flushes costs one
+    write. A background task flushes at most every ``flush_interval``
+    seconds (sooner once ``max_pending`` attempts are dirty) as unordered
+    bulk_writes of one ``$set`` per attempt into ``draft_answers``.
+
+    A failed flush is merged back and retried, so during a Mongo outage the
+    buffer only grows; past ``max_buffered`` attempts, deltas for attempts
+    not already buffered are rejected with AutosaveBufferFull.
+    """
+
+    def __init__(self, flush_interval: float = AUTOSAVE_FLUSH_INTERVAL, max_pending: int = AUTOSAVE_MAX_PENDING,
+                 max_buffered: int = AUTOSAVE_MAX_BUFFERED):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self._pending = {}
+        self._db = None
+        self._task = None
+        self._wakeup = None
+        self.deltas_received = 0
+        self.answers_received = 0
+        self.attempts_written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.rejected = 0
+
+    def add(self, exam_id: str, student_id: str, answers: dict):
+        key = (exam_id, student_id)
+        if key not in self._pending and len(self._pending) >= self.max_buffered:
+            self.rejected += 1
+            raise AutosaveBufferFull()
+        self._pending.setdefault(key, {}).update(answers)
+        self.deltas_received += 1
+        self.answers_received += len(answers)
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def is_pending(self, exam_id: str, student_id: str) -> bool:
+        return (exam_id, student_id) in self._pending
+
+    def pending_for(self, exam_id: str, student_id: str) -> dict:
+        return dict(self._pending.get((exam_id, student_id), {}))
+
+    def discard(self, exam_id: str, student_id: str):
+        """Drop buffered answers for an attempt that is being submitted."""
+        self._pending.pop((exam_id, student_id), None)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        updates = [
+            UpdateOne(
+                {"exam_id": exam_id, "student_id": student_id, "status": "in_progress"},
+                {"$set": {f"draft_answers.{qid}": text for qid, text in answers.items()}}
+            )
+            for (exam_id, student_id), answers in pending.items()
+        ]
+        try:
+            for i in range(0, len(updates), AUTOSAVE_BULK_SIZE):
+                await self._db.student_exams.bulk_write(updates[i:i + AUTOSAVE_BULK_SIZE], ordered=False)
+        except asyncio.CancelledError:
+            self._restore(pending)
+            raise
+        except Exception:
+            self.flush_errors += 1
+            self._restore(pending)
+            logger.exception("Autosave flush of %d attempts failed; will retry", len(pending))
+            return
+        self.flushes += 1
+        self.attempts_written += len(updates)
+
+    def _restore(self, pending: dict):
+        # Put a failed batch back underneath anything newer that arrived meanwhile
+        for key, answers in pending.items():
+            self._pending[key] = {**answers, **self._pending.get(key, {})}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self, db):
+        self._db = db
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_attempts": len(self._pending),
+            "deltas_received": self.deltas_received,
+            "answers_received": self.answers_received,
+            "attempts_written": self.attempts_written,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,65 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+AVAILABLE_EXAMS_MAX_TTL = float(os.environ.get('AVAILABLE_EXAMS_MAX_TTL', 60))
+
+
+def next_boundary(exams: list, now: datetime):
+    """Earliest start_time or end_time still ahead of ``now``, or None."""
+    upcoming = [
+        t for e in exams for t in (e.get('start_time'), e.get('end_time'))
+        if isinstance(t, datetime) and t.tzinfo is not None and t > now
+    ]
+    return min(upcoming, default=None)
+
+
+class AvailableExamsCache:
+    """Per-class list of exams a student can currently see.
+
+    The list only changes when an exam is created or deleted or one of its
+    start/end times passes, so each entry expires at the next such boundary
+    among its exams. ``max_ttl`` caps that, because exams created through
+    another worker process do not invalidate this one's copy.
+    """
+
+    def __init__(self, max_ttl: float = AVAILABLE_EXAMS_MAX_TTL):
+        self.max_ttl = timedelta(seconds=max_ttl)
+        self._entries = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, class_name, loader) -> list:
+        """Return the cached list, calling ``await loader(class_name, now)`` when absent or expired."""
+        now = datetime.now(timezone.utc)
+        entry = self._entries.get(class_name)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        generation = self._generation
+        exams = await loader(class_name, now)
+        expires = now + self.max_ttl
+        boundary = next_boundary(exams, now)
+        if boundary is not None:
+            expires = min(expires, boundary)
+        # An invalidation during the load means the list may already be stale
+        if generation == self._generation:
+            self._entries[class_name] = (expires, exams)
+        return exams
+
+    def invalidate(self):
+        # Exams without a class_name are visible to every class, so drop them all
+        self._generation += 1
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "classes": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
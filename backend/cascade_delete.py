@@ -0,0 +1,197 @@
+"""Background cascade deletion of exam dependents.
+
+Deleting an exam or subject removes the parent documents inline and hands
+the exam ids to ``CascadeDeleter``, which removes their questions and
+attempts in bounded batches, pausing between batches so the deletes never
+hold the collection for long or crowd out student requests. Each deleted
+batch of attempts takes its dashboard counters with it.
+
+Attempts are deleted per status group, matching the status that was read,
+so one graded between the read and the delete is left for the next batch
+with its new state. If a group deletes some but not all of the attempts
+that were read (another worker holding a lapsed lease got there first, or
+one changed status), its counters are not decremented and the job is
+marked ``stats_stale``. Rebuilding the counters is left to the operator
+(``python stats.py --reconcile``), since doing it under live traffic would
+briefly zero every dashboard.
+
+Jobs are recorded in the ``delete_jobs`` collection so any worker can
+report on them, and each one is leased while it runs and renews the lease
+with every batch. Every worker periodically claims running jobs whose
+lease has lapsed, so a job whose worker died is finished by another.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from stats import bump, bump_students, percentage
+
+DELETE_BATCH_SIZE = int(os.environ.get('DELETE_BATCH_SIZE', 500))
+DELETE_BATCH_PAUSE = float(os.environ.get('DELETE_BATCH_PAUSE', 0.05))
+DELETE_JOB_LEASE = float(os.environ.get('DELETE_JOB_LEASE', 60))
+
+logger = logging.getLogger(__name__)
+
+
+def attempt_stat_deltas(attempts: list):
+    """Counter decrements for deleting ``attempts``: (total_submissions, per-student increments)."""
+    submissions = 0
+    students = {}
+    for a in attempts:
+        deltas = students.setdefault(a['student_id'], {})
+        if a.get('status') == 'in_progress':
+            deltas['in_progress'] = deltas.get('in_progress', 0) - 1
+            continue
+        submissions += 1
+        deltas['completed'] = deltas.get('completed', 0) - 1
+        if a.get('status') == 'graded' and isinstance(a.get('score'), (int, float)):
+            deltas['graded_count'] = deltas.get('graded_count', 0) - 1
+            deltas['percentage_sum'] = deltas.get('percentage_sum', 0.0) - percentage(a['score'], a.get('total_points'))
+    return submissions, students
+
+
+class CascadeDeleter:
+    def __init__(self, batch_size: int = DELETE_BATCH_SIZE, pause: float = DELETE_BATCH_PAUSE,
+                 lease: float = DELETE_JOB_LEASE):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lease = timedelta(seconds=lease)
+        self._db = None
+        self._on_exam_done = None
+        self._tasks = set()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def submit(self, kind: str, target_id: str, exam_ids: list) -> dict:
+        """Record a job for ``exam_ids`` (already removed from ``exams``) and start it."""
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "target_id": target_id,
+            "exam_ids": exam_ids,
+            "status": "running",
+            "deleted": {"questions": 0, "student_exams": 0},
+            "created_at": now,
+            "updated_at": now,
+            "lease_until": now + self.lease,
+        }
+        await self._db.delete_jobs.insert_one(job)
+        job.pop('_id', None)
+        job.pop('lease_until')
+        self._spawn(self._run(job['id']))
+        return job
+
+    async def get(self, job_id: str):
+        return await self._db.delete_jobs.find_one({"id": job_id}, {"_id": 0, "lease_until": 0})
+
+    async def _renew(self, job_id: str, **deleted):
+        now = datetime.now(timezone.utc)
+        update = {"$set": {"updated_at": now, "lease_until": now + self.lease}}
+        if deleted:
+            update["$inc"] = {f"deleted.{name}": n for name, n in deleted.items()}
+        await self._db.delete_jobs.update_one({"id": job_id}, update)
+
+    async def _delete_batches(self, job_id: str, collection: str, exam_id: str):
+        projection = {"_id": 1}
+        if collection == "student_exams":
+            projection.update({"student_id": 1, "status": 1, "score": 1, "total_points": 1})
+        while True:
+            batch = await self._db[collection].find({"exam_id": exam_id}, projection) \
+                .limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                return
+            if collection == "student_exams":
+                deleted = await self._delete_attempts(job_id, batch)
+            else:
+                result = await self._db[collection].delete_many({"_id": {"$in": [d['_id'] for d in batch]}})
+                deleted = result.deleted_count
+            await self._renew(job_id, **{collection: deleted})
+            await asyncio.sleep(self.pause)
+
+    async def _delete_attempts(self, job_id: str, batch: list) -> int:
+        groups = {}
+        for attempt in batch:
+            groups.setdefault(attempt.get('status'), []).append(attempt)
+        deleted = 0
+        for status, attempts in groups.items():
+            result = await self._db.student_exams.delete_many(
+                {"_id": {"$in": [a['_id'] for a in attempts]}, "status": status}
+            )
+            deleted += result.deleted_count
+            if result.deleted_count != len(attempts):
+                # Some changed status or were removed by another worker; which ones is unknown
+                if result.deleted_count:
+                    await self._db.delete_jobs.update_one({"id": job_id}, {"$set": {"stats_stale": True}})
+                continue
+            submissions, students = attempt_stat_deltas(attempts)
+            if submissions:
+                await bump(self._db, total_submissions=-submissions)
+            await bump_students(self._db, students)
+        return deleted
+
+    async def _run(self, job_id: str):
+        try:
+            job = await self._db.delete_jobs.find_one({"id": job_id}, {"_id": 0, "exam_ids": 1})
+            for exam_id in job['exam_ids']:
+                await self._delete_batches(job_id, "questions", exam_id)
+                await self._delete_batches(job_id, "student_exams", exam_id)
+                if self._on_exam_done is not None:
+                    self._on_exam_done(exam_id)
+            job = await self._db.delete_jobs.find_one({"id": job_id}, {"_id": 0, "stats_stale": 1})
+            if job.get('stats_stale'):
+                logger.warning("Delete job %s raced another writer; dashboard counters may be off until "
+                               "`python stats.py --reconcile` is run", job_id)
+            await self._db.delete_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"status": "completed", "updated_at": datetime.now(timezone.utc)}}
+            )
+            logger.info("Delete job %s completed", job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Delete job %s failed", job_id)
+            await self._db.delete_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.now(timezone.utc)}}
+            )
+
+    async def resume(self):
+        """Claim and restart running jobs whose lease has expired."""
+        while True:
+            now = datetime.now(timezone.utc)
+            job = await self._db.delete_jobs.find_one_and_update(
+                {"status": "running", "lease_until": {"$lt": now}},
+                {"$set": {"lease_until": now + self.lease}},
+                projection={"_id": 0, "id": 1}
+            )
+            if not job:
+                return
+            logger.info("Resuming delete job %s", job['id'])
+            self._spawn(self._run(job['id']))
+
+    async def _resumer(self):
+        while True:
+            try:
+                await self.resume()
+            except Exception:
+                logger.exception("Resuming delete jobs failed")
+            await asyncio.sleep(self.lease.total_seconds())
+
+    def start(self, db, on_exam_done=None):
+        """``on_exam_done(exam_id)`` runs once an exam's dependents are gone."""
+        self._db = db
+        self._on_exam_done = on_exam_done
+        self._spawn(self._resumer())
+
+    async def stop(self):
+        # Interrupted jobs keep their lease until it lapses, then another worker resumes them
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,53 @@
+"""Precomputed exam bundles for students taking an exam.
+
+A bundle is the exam's metadata and its student-safe questions serialized
+once into a single JSON body, kept both plain and gzip-compressed. Its
+strong ETag is a hash of that body, so it changes exactly when the
+question set (or the exam) does and is the same in every worker process.
+A reload that sends the ETag back in ``If-None-Match`` is answered 304
+with no body.
+"""
+import gzip
+import hashlib
+import json
+
+from starlette.responses import Response
+
+# no-cache still lets the browser keep the body, but it must revalidate on every reload
+BUNDLE_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: str, etags) -> bool:
+    # If-None-Match uses the weak comparison, so a W/ prefix still matches
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return not candidates.isdisjoint(etags)
+
+
+class ExamBundle:
+    __slots__ = ('body', 'gzipped', 'etag', 'gzip_etag')
+
+    def __init__(self, payload: dict):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # mtime=0 keeps the compressed bytes identical across workers and restarts
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Each encoding is a different representation, so each gets its own strong tag
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+    def response(self, headers) -> Response:
+        use_gzip = "gzip" in headers.get("accept-encoding", "").lower()
+        response_headers = {
+            "ETag": self.gzip_etag if use_gzip else self.etag,
+            "Cache-Control": BUNDLE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, (self.etag, self.gzip_etag)):
+            return Response(status_code=304, headers=response_headers)
+        if use_gzip:
+            response_headers["Content-Encoding"] = "gzip"
+            return Response(self.gzipped, media_type="application/json", headers=response_headers)
+        return Response(self.body, media_type="application/json", headers=response_headers)
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+
+from grading import AnswerKey
+
+EXAM_CACHE_MAX_BYTES = int(os.environ.get('EXAM_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+EXAM_CACHE_MAX_TTL = float(os.environ.get('EXAM_CACHE_MAX_TTL', 30))
+# Fixed cost charged per entry so a flood of tiny papers still fills the bound
+EXAM_CACHE_ENTRY_OVERHEAD = 2048
+
+
+class ExamPaper:
+    """A cached exam paper: questions sorted by order plus the student-safe view."""
+
+    __slots__ = ('exam_id', 'questions', 'student_questions', 'size', '_answer_key', 'bundle', 'loaded_at')
+
+    def __init__(self, exam_id: str, questions: list):
+        self.exam_id = exam_id
+        self.questions = questions
+        self.student_questions = [
+            {k: v for k, v in q.items() if k != 'correct_answer'} for q in questions
+        ]
+        # Approximate footprint; good enough to keep the cache within its bound
+        self.size = EXAM_CACHE_ENTRY_OVERHEAD + 2 * len(json.dumps(questions, default=str))
+        self._answer_key = None
+        # Exam bundle served to students, built on the first request for it
+        self.bundle = None
+        self.loaded_at = time.monotonic()
+
+    @property
+    def answer_key(self) -> AnswerKey:
+        # Compiled on first submission; admins browsing the paper never pay for it
+        if self._answer_key is None:
+            self._answer_key = AnswerKey(self.questions)
+        return self._answer_key
+
+
+class ExamPaperCache:
+    """Per-exam LRU cache of question papers, bounded by approximate memory use.
+
+    Concurrent misses for the same exam share a single load, and an
+    invalidation that lands while a load is in flight prevents the stale
+    result from being stored. ``max_ttl`` caps how long a paper is served,
+    because question writes and regrades through another worker process do
+    not invalidate this one's copy.
+    """
+
+    def __init__(self, max_bytes: int = EXAM_CACHE_MAX_BYTES, max_ttl: float = EXAM_CACHE_MAX_TTL):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._stale = set()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, exam_id: str, loader) -> ExamPaper:
+        """Return the cached paper, calling ``await loader(exam_id)`` on a miss."""
+        paper = self._entries.get(exam_id)
+        if paper is not None and time.monotonic() - paper.loaded_at >= self.max_ttl:
+            self._discard(exam_id)
+            self.expirations += 1
+            paper = None
+        if paper is not None:
+            self._entries.move_to_end(exam_id)
+            self.hits += 1
+            return paper
+
+        self.misses += 1
+        pending = self._loading.get(exam_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(exam_id, loader))
+            self._loading[exam_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _load(self, exam_id: str, loader) -> ExamPaper:
+        # The loader raises for an exam that does not exist, so nothing is cached for it
+        try:
+            paper = ExamPaper(exam_id, await loader(exam_id))
+        finally:
+            self._loading.pop(exam_id, None)
+            stale = exam_id in self._stale
+            self._stale.discard(exam_id)
+        if not stale:
+            self._store(paper)
+        return paper
+
+    def attach_bundle(self, paper: ExamPaper, bundle) -> None:
+        """Keep ``bundle`` on ``paper``, counting its plain and gzip bodies against the bound."""
+        if paper.bundle is not None:
+            return
+        paper.bundle = bundle
+        added = len(bundle.body) + len(bundle.gzipped)
+        paper.size += added
+        if self._entries.get(paper.exam_id) is paper:
+            self.current_bytes += added
+            self._evict()
+
+    def _store(self, paper: ExamPaper):
+        if paper.size > self.max_bytes:
+            return
+        self._discard(paper.exam_id)
+        self._entries[paper.exam_id] = paper
+        self.current_bytes += paper.size
+        self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.size
+            self.evictions += 1
+
+    def _discard(self, exam_id: str):
+        paper = self._entries.pop(exam_id, None)
+        if paper is not None:
+            self.current_bytes -= paper.size
+
+    def invalidate(self, exam_id: str):
+        # Only a load already in flight needs to know; it must not store what it read
+        if exam_id in self._loading:
+            self._stale.add(exam_id)
+        self._discard(exam_id)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
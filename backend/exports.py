@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from fast_json import json_default
+
+EXPORT_CHUNK_ROWS = 500
+
+RESULT_COLUMNS = [
+    "id", "student_id", "student_name", "class_name", "exam_title", "subject_name",
+    "status", "score", "total_points", "started_at", "submitted_at",
+]
+
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def stream_results_csv(cursor, question_ids=None):
+    """Yield CSV text in chunks of EXPORT_CHUNK_ROWS rows from a student_exams cursor.
+
+    When ``question_ids`` is given, one answer column per question is
+    appended in paper order.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = list(RESULT_COLUMNS)
+    if question_ids:
+        header += [f"q{n}" for n in range(1, len(question_ids) + 1)]
+    writer.writerow(header)
+
+    rows = 0
+    async for doc in cursor:
+        row = [_cell(doc.get(column)) for column in RESULT_COLUMNS]
+        if question_ids:
+            answers = {a.get('question_id'): a.get('answer_text') for a in doc.get('answers') or []}
+            row += [_cell(answers.get(qid, '')) for qid in question_ids]
+        writer.writerow(row)
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def stream_results_ndjson(cursor):
+    """Yield one JSON document per line, batched in chunks of EXPORT_CHUNK_ROWS."""
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(doc, default=json_default, ensure_ascii=False))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
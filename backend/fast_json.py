@@ -0,0 +1,75 @@
+"""Opt-in orjson response path for large list endpoints.
+
+With ``FAST_JSON_RESPONSES=true`` (and orjson installed) paginated list
+endpoints hand their documents straight to orjson instead of letting
+FastAPI validate each one into its response model and serialize it again.
+Documents written by this app already have the model's shape, so the
+query projects exactly the model's fields and ``render`` only fills absent
+defaults and widens ints stored in float fields; the bytes match what the
+Pydantic path produces for BSON datetimes. Legacy ISO-string timestamps
+(see migrate_datetimes.py) are passed through unchanged.
+
+``json_default`` is the stdlib ``json`` counterpart for code that streams
+documents itself (the NDJSON export and the live results stream).
+"""
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import get_args
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the Pydantic path is used without it
+    orjson = None
+
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', 'false').lower() in ('1', 'true', 'yes')
+
+
+def enabled() -> bool:
+    return FAST_JSON_RESPONSES and orjson is not None
+
+
+def json_default(value):
+    """``default=`` hook for the stdlib json module: datetimes as ISO 8601 strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@lru_cache(maxsize=None)
+def _layout(model):
+    """(projection, defaults, float fields) for a response model."""
+    projection = {"_id": 0}
+    defaults = {}
+    floats = []
+    for name, field in model.model_fields.items():
+        projection[name] = 1
+        if not field.is_required() and field.default_factory is None:
+            defaults[name] = field.default
+        if field.annotation is float or float in get_args(field.annotation):
+            floats.append(name)
+    return projection, defaults, tuple(floats)
+
+
+def projection(model) -> dict:
+    return dict(_layout(model)[0])
+
+
+def render(docs: list, model) -> bytes:
+    """Serialize trusted documents as a JSON array in ``model``'s shape."""
+    _, defaults, floats = _layout(model)
+    for doc in docs:
+        for name, value in defaults.items():
+            if name not in doc:
+                doc[name] = value
+        for name in floats:
+            value = doc.get(name)
+            if type(value) is int:
+                doc[name] = float(value)
+    return orjson.dumps(docs, option=orjson.OPT_UTC_Z)
+
+
+def list_response(docs: list, model, headers: dict = None) -> Response:
+    return Response(content=render(docs, model), media_type="application/json", headers=headers)
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+UNANSWERED = -1
+NOT_A_KEY = -2
+UNGRADED = -3
+
+
+class AnswerKey:
+    """An exam's answer key compiled into flat arrays for batch grading.
+
+    ``index`` maps question id to column; ``correct`` holds the expected
+    answer code per column and ``points`` its weight. Answer texts are
+    encoded through ``codes``, the vocabulary of correct answers, so grading
+    compares small integers instead of strings: any text that is not some
+    question's correct answer encodes to NOT_A_KEY and can never match.
+    Essays stay as UNGRADED columns so response matrices line up with the
+    paper, but never score.
+
+    A single submission is graded through ``scoring``, a plain
+    ``{question_id: (correct_answer, points)}`` lookup; it costs about the
+    same as looping over the question documents did, and the saving on
+    submit is the question fetch the cached key replaces. The matrices are
+    for batches (regrade, item analysis).
+    """
+
+    __slots__ = ('question_ids', 'index', 'codes', 'correct', 'points', 'scoring')
+
+    def __init__(self, questions: list):
+        self.question_ids = [q['id'] for q in questions]
+        self.index = {qid: i for i, qid in enumerate(self.question_ids)}
+        self.codes = {}
+        correct = []
+        for q in questions:
+            answer = q.get('correct_answer')
+            if q.get('question_type') == 'multiple_choice' and answer is not None:
+                correct.append(self.codes.setdefault(answer, len(self.codes)))
+            else:
+                correct.append(UNGRADED)
+        self.correct = np.array(correct, dtype=np.int32)
+        self.points = np.array([q.get('points', 0) for q in questions], dtype=np.int64)
+        self.scoring = {
+            q['id']: (q['correct_answer'], q.get('points', 0))
+            for q in questions
+            if q.get('question_type') == 'multiple_choice' and q.get('correct_answer') is not None
+        }
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def response_matrix(self, submissions) -> np.ndarray:
+        """Stack many submissions (lists of answer dicts) into a students x questions code matrix.
+
+        The answers are flattened once into parallel row/column/code arrays
+        and scattered into the matrix with a single fancy-indexed assignment.
+        """
+        index, codes = self.index, self.codes
+        matrix = np.full((len(submissions), len(self)), UNANSWERED, dtype=np.int32)
+        rows = np.repeat(np.arange(len(submissions)), [len(answers) for answers in submissions])
+        columns = np.array([index.get(a.get('question_id'), -1) for answers in submissions for a in answers],
+                           dtype=np.int64)
+        encoded = np.array([codes.get(a.get('answer_text'), NOT_A_KEY) for answers in submissions for a in answers],
+                           dtype=np.int32)
+        known = columns >= 0
+        matrix[rows[known], columns[known]] = encoded[known]
+        return matrix
+
+    def correctness(self, responses: np.ndarray) -> np.ndarray:
+        """Boolean matrix (or row) of which responses earn their question's points."""
+        return responses == self.correct
+
+    def grade(self, answers) -> int:
+        """Score one submission; ``answers`` may hold Answer models or plain dicts.
+
+        If a question is answered more than once the last answer wins, so
+        repeating a correct answer cannot earn its points twice.
+        """
+        latest = {}
+        for answer in answers:
+            if isinstance(answer, dict):
+                latest[answer.get('question_id')] = answer.get('answer_text')
+            else:
+                latest[answer.question_id] = answer.answer_text
+        scoring = self.scoring
+        total = 0
+        for question_id, text in latest.items():
+            entry = scoring.get(question_id)
+            if entry is not None and text == entry[0]:
+                total += entry[1]
+        return total
+
+    def grade_batch(self, submissions) -> np.ndarray:
+        """Score many submissions at once; returns an int64 array of scores."""
+        if not len(submissions) or not len(self):
+            return np.zeros(len(submissions), dtype=np.int64)
+        return self.correctness(self.response_matrix(submissions)) @ self.points
@@ -0,0 +1,210 @@
+"""Index bootstrap and query-plan verification.
+
+``ensure_indexes`` runs from the app's startup hook and is idempotent:
+create_index is a no-op when an identical index already exists.
+
+Run ``python indexes.py --check`` to create the indexes and then explain
+every query shape used by server.py, failing if any falls back to COLLSCAN.
+Databases that already hold duplicate attempts for one (exam_id,
+student_id) cannot build the unique index; ``python indexes.py --dedupe``
+keeps the most advanced attempt of each pair, rebuilds the dashboard
+counters and then creates the indexes.
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+import stats
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "subjects": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "exams": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("end_time", ASCENDING), ("class_name", ASCENDING)], name="end_time_class_name"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("subject_id", ASCENDING)], name="subject_id"),
+    ],
+    "questions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("exam_id", ASCENDING), ("order", ASCENDING)], name="exam_id_order"),
+    ],
+    "student_exams": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One attempt per student per exam; start_exam relies on it to be race-free
+        IndexModel([("exam_id", ASCENDING), ("student_id", ASCENDING)], name="exam_id_student_id", unique=True),
+        IndexModel([("student_id", ASCENDING), ("status", ASCENDING)], name="student_id_status"),
+        IndexModel([("status", ASCENDING), ("submitted_at", ASCENDING)], name="status_submitted_at"),
+        # Keyset pagination: every listing sorts on (started_at, id) under its equality filter
+        IndexModel([("started_at", DESCENDING), ("id", DESCENDING)], name="started_at_id"),
+        IndexModel([("student_id", ASCENDING), ("started_at", DESCENDING), ("id", DESCENDING)],
+                   name="student_id_started_at_id"),
+        IndexModel([("exam_id", ASCENDING), ("started_at", DESCENDING), ("id", DESCENDING)],
+                   name="exam_id_started_at_id"),
+        IndexModel([("class_name", ASCENDING), ("started_at", DESCENDING), ("id", DESCENDING)],
+                   name="class_name_started_at_id"),
+    ],
+    "delete_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+    ],
+    "regrade_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("exam_id", ASCENDING), ("created_at", DESCENDING)], name="exam_id_created_at"),
+    ],
+}
+
+EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# Every query shape issued by server.py: (collection, filter, sort).
+# Literal values are placeholders; only the shape matters to the planner.
+QUERY_SHAPES = [
+    ("users", {"email": "x@example.com"}, None),
+    ("users", {"id": "x"}, None),
+    ("users", {"role": "student"}, None),
+    ("subjects", {"id": "x"}, None),
+    ("exams", {"id": "x"}, None),
+    ("exams", {"$and": [
+        {"$or": [{"class_name": "x"}, {"class_name": None}]},
+        {"$or": [{"end_time": None}, {"end_time": {"$gte": EPOCH}}]},
+    ]}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("questions", {"exam_id": "x"}, [("order", ASCENDING)]),
+    ("questions", {"id": "x"}, None),
+    ("student_exams", {"exam_id": "x", "student_id": "x"}, None),
+    ("student_exams", {"exam_id": "x", "student_id": "x", "status": "in_progress"}, None),
+    ("student_exams", {"id": "x"}, None),
+    ("student_exams", {"exam_id": "x"}, None),
+    ("student_exams", {"exam_id": "x", "status": "graded"}, None),
+    ("subjects", {}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("exams", {}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("student_exams", {}, [("started_at", DESCENDING), ("id", DESCENDING)]),
+    ("student_exams", {"student_id": "x"}, [("started_at", DESCENDING), ("id", DESCENDING)]),
+    ("student_exams", {"exam_id": "x"}, [("started_at", DESCENDING), ("id", DESCENDING)]),
+    ("student_exams", {"class_name": "x"}, [("started_at", DESCENDING), ("id", DESCENDING)]),
+    ("student_exams", {"$and": [{"exam_id": "x"}, {"$or": [
+        {"started_at": {"$lt": EPOCH}},
+        {"started_at": EPOCH, "id": {"$lt": "x"}},
+    ]}]}, [("started_at", DESCENDING), ("id", DESCENDING)]),
+    ("student_exams", {"student_id": "x", "status": {"$in": ["submitted", "graded"]}}, None),
+    ("student_exams", {"status": "submitted"}, None),
+    ("student_exams", {"status": "submitted", "id": {"$nin": ["x"]}}, [("submitted_at", ASCENDING)]),
+    ("student_exams", {"id": "x", "status": "submitted"}, None),
+    ("student_exams", {"status": "graded", "score": {"$type": "number"}, "total_points": {"$gt": 0},
+                       "submitted_at": {"$gte": EPOCH}}, None),
+    ("exams", {"subject_id": "x"}, None),
+    ("delete_jobs", {"id": "x"}, None),
+    ("delete_jobs", {"status": "running", "lease_until": {"$lt": EPOCH}}, None),
+    ("regrade_jobs", {"id": "x"}, None),
+    ("regrade_jobs", {"exam_id": "x"}, [("created_at", DESCENDING)]),
+    ("student_exams", {"id": "x", "status": "graded", "score": 0}, None),
+]
+
+
+async def ensure_indexes(db):
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            if e.code != 11000:
+                raise
+            # Existing duplicates block a unique index; keep serving and build the rest
+            logger.error("Duplicate documents block a unique index on %s; run `python indexes.py --dedupe`",
+                         collection)
+            await db[collection].create_indexes([i for i in indexes if not i.document.get('unique')])
+    logger.info("Indexes ensured for %d collections", len(INDEXES))
+
+
+ATTEMPT_RANK = {"in_progress": 1, "submitted": 2, "graded": 3}
+
+
+async def dedupe_attempts(db) -> int:
+    """Delete all but the most advanced (then latest) attempt per (exam_id, student_id)."""
+    removed = 0
+    pipeline = [
+        {"$group": {"_id": {"exam_id": "$exam_id", "student_id": "$student_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    async for group in db.student_exams.aggregate(pipeline, allowDiskUse=True):
+        attempts = await db.student_exams.find(group["_id"], {"_id": 1, "status": 1}) \
+            .sort("started_at", DESCENDING).to_list(None)
+        keep = max(attempts, key=lambda a: ATTEMPT_RANK.get(a.get("status"), 0))
+        result = await db.student_exams.delete_many(
+            {"_id": {"$in": [a["_id"] for a in attempts if a is not keep]}}
+        )
+        removed += result.deleted_count
+    if removed:
+        logger.info("Removed %d duplicate attempts", removed)
+        await stats.reconcile(db)
+    return removed
+
+
+def _plan_stages(plan):
+    """Yield every stage name found anywhere in an explain plan tree."""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def verify_query_plans(db) -> list:
+    """Explain each query shape and return the ones whose winning plan is a COLLSCAN."""
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning = explain.get('queryPlanner', {}).get('winningPlan', {})
+        stages = set(_plan_stages(winning))
+        if 'COLLSCAN' in stages:
+            failures.append((collection, query, sort))
+            logger.error("COLLSCAN: %s.find(%s).sort(%s)", collection, query, sort)
+        else:
+            logger.info("OK %s: %s.find(%s).sort(%s)", sorted(stages), collection, query, sort)
+    return failures
+
+
+async def _main(check: bool, dedupe: bool) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if dedupe:
+            print(f"Removed {await dedupe_attempts(db)} duplicate attempts")
+        await ensure_indexes(db)
+        if check:
+            failures = await verify_query_plans(db)
+            if failures:
+                print(f"{len(failures)} query shape(s) fall back to COLLSCAN")
+                return 1
+            print(f"All {len(QUERY_SHAPES)} query shapes use an index")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main('--check' in sys.argv, '--dedupe' in sys.argv)))
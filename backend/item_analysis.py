@@ -0,0 +1,197 @@
+"""Classical item analysis for an exam's auto-graded questions.
+
+From the students x questions response matrix this computes each item's
+difficulty (p-value, the share answering correctly), its discrimination
+(point-biserial correlation with the rest-of-test score, i.e. the total
+minus the item itself), per-option distractor frequencies, and the exam's
+KR-20 reliability. Everything past building the matrix is NumPy column
+arithmetic, and it runs on a worker thread so a large cohort does not
+stall the event loop.
+"""
+import asyncio
+import os
+import time
+
+import numpy as np
+
+# Submissions graded by another worker process never invalidate this one's copy
+ITEM_ANALYSIS_MAX_TTL = float(os.environ.get('ITEM_ANALYSIS_MAX_TTL', 60))
+
+OMITTED = -1
+OTHER = -2
+
+
+def _round(value, digits=4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def choice_matrix(questions: list, submissions: list) -> np.ndarray:
+    """Students x questions matrix of chosen option indexes.
+
+    Multiple-choice answers are stored as the option index ("0", "1", ...).
+    Blank answers are OMITTED; anything that is not a valid option (essay
+    text, stale indexes) is OTHER. Like ``AnswerKey.response_matrix`` the
+    answers are flattened once and scattered with one indexed assignment.
+    """
+    index = {q['id']: i for i, q in enumerate(questions)}
+    option_counts = np.array([len(q.get('options') or []) for q in questions], dtype=np.int64)
+    option_codes = {str(o): o for o in range(int(option_counts.max(initial=0)))}
+    matrix = np.full((len(submissions), len(questions)), OMITTED, dtype=np.int16)
+    rows = np.repeat(np.arange(len(submissions)), [len(answers) for answers in submissions])
+    columns = np.array([index.get(a.get('question_id'), -1) for answers in submissions for a in answers],
+                       dtype=np.int64)
+    choices = np.array([option_codes.get(text, OTHER) if text else OMITTED
+                        for answers in submissions for a in answers
+                        for text in (a.get('answer_text'),)], dtype=np.int64)
+    known = columns >= 0
+    # A blank answer never overwrites an earlier one for the same question
+    keep = known & (choices != OMITTED)
+    rows, columns, choices = rows[keep], columns[keep], choices[keep]
+    choices[choices >= option_counts[columns]] = OTHER
+    matrix[rows, columns] = choices
+    return matrix
+
+
+def compute_item_analysis(questions: list, answer_key, submissions: list) -> dict:
+    """Analyse ``submissions`` (lists of answer dicts) against ``questions`` in paper order."""
+    n = len(submissions)
+    gradable = answer_key.correct >= 0
+    correct = answer_key.correctness(answer_key.response_matrix(submissions))[:, gradable].astype(np.float64)
+    points = answer_key.points[gradable].astype(np.float64)
+    choices = choice_matrix(questions, submissions)
+    k = correct.shape[1]
+
+    total = correct @ points
+    difficulty = np.full(k, np.nan)
+    discrimination = np.full(k, np.nan)
+    if n:
+        difficulty = correct.mean(axis=0)
+        # Point-biserial against the rest score, so an item is not correlated with itself
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rest = total[:, None] - correct * points
+            cov = (correct * rest).mean(axis=0) - difficulty * rest.mean(axis=0)
+            discrimination = cov / (np.sqrt(difficulty * (1 - difficulty)) * rest.std(axis=0))
+
+    kr20 = None
+    if k > 1 and n > 1:
+        number_correct_var = correct.sum(axis=1).var()
+        if number_correct_var > 0:
+            kr20 = _round(k / (k - 1) * (1 - (difficulty * (1 - difficulty)).sum() / number_correct_var))
+
+    items = []
+    gradable_columns = {col: j for j, col in enumerate(np.flatnonzero(gradable))}
+    for col, question in enumerate(questions):
+        options = question.get('options') or []
+        counts = np.bincount(choices[:, col] - OTHER, minlength=len(options) + 2)
+        item = {
+            "question_id": question['id'],
+            "order": question.get('order'),
+            "question_type": question.get('question_type'),
+            "points": question.get('points'),
+            "answered": int(n - counts[OMITTED - OTHER]),
+            "omitted": int(counts[OMITTED - OTHER]),
+            "difficulty": None,
+            "discrimination": None,
+            "options": [],
+        }
+        j = gradable_columns.get(col)
+        if j is not None:
+            item["difficulty"] = _round(difficulty[j])
+            item["discrimination"] = _round(discrimination[j])
+        if question.get('question_type') == 'multiple_choice':
+            item["options"] = [
+                {
+                    "index": o,
+                    "text": text,
+                    "is_correct": str(o) == question.get('correct_answer'),
+                    "count": int(counts[o - OTHER]),
+                    "frequency": _round(counts[o - OTHER] / n) if n else None,
+                }
+                for o, text in enumerate(options)
+            ]
+            item["other"] = int(counts[0])
+        items.append(item)
+
+    return {
+        "students": n,
+        "graded_items": k,
+        "kr20": kr20,
+        "mean_score": _round(total.mean(), 2) if n else None,
+        "score_sd": _round(total.std(), 2) if n else None,
+        "items": items,
+    }
+
+
+async def analyze_exam(db, exam_id: str, paper) -> dict:
+    """Item analysis over every graded submission of an exam."""
+    started = time.perf_counter()
+    cursor = db.student_exams.find(
+        {"exam_id": exam_id, "status": "graded"},
+        {"_id": 0, "answers": 1}
+    ).batch_size(5000)
+    submissions = [doc.get('answers') or [] async for doc in cursor]
+    result = await asyncio.to_thread(compute_item_analysis, paper.questions, paper.answer_key, submissions)
+    result["exam_id"] = exam_id
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+class ItemAnalysisCache:
+    """Per-exam item analyses, kept until the exam's submissions change.
+
+    Concurrent misses for the same exam share one computation, and an
+    invalidation that lands while it runs prevents the stale result from
+    being stored. ``max_ttl`` caps each entry, because submissions graded
+    by another worker process do not invalidate this one's copy.
+    """
+
+    def __init__(self, max_ttl: float = ITEM_ANALYSIS_MAX_TTL):
+        self.max_ttl = max_ttl
+        self._entries = {}
+        self._loading = {}
+        self._stale = set()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, exam_id: str, loader) -> dict:
+        """Return the cached analysis, calling ``await loader(exam_id)`` when absent or expired."""
+        entry = self._entries.get(exam_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self.hits += 1
+            return entry[1]
+
+        self._entries.pop(exam_id, None)
+        self.misses += 1
+        pending = self._loading.get(exam_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(exam_id, loader))
+            self._loading[exam_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _load(self, exam_id: str, loader) -> dict:
+        try:
+            result = await loader(exam_id)
+        finally:
+            self._loading.pop(exam_id, None)
+            stale = exam_id in self._stale
+            self._stale.discard(exam_id)
+        # A submission that landed mid-computation makes this result stale already
+        if not stale:
+            self._entries[exam_id] = (time.monotonic() + self.max_ttl, result)
+        return result
+
+    def invalidate(self, exam_id: str):
+        if exam_id in self._loading:
+            self._stale.add(exam_id)
+        self._entries.pop(exam_id, None)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "exams": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,110 @@
+"""Live per-exam results pushed to admins over server-sent events.
+
+Request handlers call ``LiveResults.publish`` when a student starts,
+autosaves, submits or is graded. Each event is serialized once and fanned
+out to every subscriber of that exam through a bounded per-subscriber
+queue, so a slow proctor's connection never holds up the request that
+published. A subscriber first receives a snapshot of the exam's attempts
+and then only the deltas.
+
+The subscriber is registered before the snapshot is read, so an event
+racing the snapshot may arrive after it although the snapshot already
+reflects it; every event carries the attempt id and its new state, so
+applying it again is harmless. A subscriber whose queue fills up, and every
+subscriber of an exam that was re-graded or deleted, is sent a "resync"
+event and disconnected; EventSource reconnects and starts from a fresh
+snapshot.
+
+EventSource cannot set an Authorization header, so a browser client first
+POSTs ``/exams/{exam_id}/live/token`` and opens the stream with
+``?token=``. The token is scoped to that exam's stream and short-lived;
+once it expires a reconnect is refused, the EventSource closes, and the
+client fetches a new token and opens a new one.
+
+The pub/sub is per process: with several workers a subscriber only sees
+events handled by its own worker until it reconnects.
+"""
+import asyncio
+import json
+import os
+
+from fast_json import json_default
+
+LIVE_RESULTS_QUEUE_SIZE = int(os.environ.get('LIVE_RESULTS_QUEUE_SIZE', 1000))
+LIVE_RESULTS_KEEPALIVE = float(os.environ.get('LIVE_RESULTS_KEEPALIVE', 15.0))
+LIVE_RESULTS_RETRY_MS = 3000
+
+
+def format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=json_default, ensure_ascii=False)}\n\n"
+
+
+class LiveResults:
+    def __init__(self, queue_size: int = LIVE_RESULTS_QUEUE_SIZE, keepalive: float = LIVE_RESULTS_KEEPALIVE):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self._subscribers = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def publish(self, exam_id: str, event: str, data: dict):
+        subscribers = self._subscribers.get(exam_id)
+        if not subscribers:
+            return
+        self.published += 1
+        message = format_event(event, {"exam_id": exam_id, **data})
+        for queue in list(subscribers):
+            try:
+                queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._close(exam_id, queue, "lagging")
+
+    def _close(self, exam_id: str, queue: asyncio.Queue, reason: str):
+        # Pending deltas are moot once the subscriber has to re-snapshot
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(format_event("resync", {"exam_id": exam_id, "reason": reason}))
+        queue.put_nowait(None)
+        self._unsubscribe(exam_id, queue)
+
+    def _unsubscribe(self, exam_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(exam_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[exam_id]
+
+    def reset(self, exam_id: str, reason: str):
+        """Disconnect every subscriber of an exam whose attempts changed wholesale."""
+        for queue in list(self._subscribers.get(exam_id, ())):
+            self._close(exam_id, queue, reason)
+
+    async def stream(self, exam_id: str, snapshot):
+        """Yield SSE text: ``await snapshot()`` as the first event, then the deltas."""
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(exam_id, set()).add(queue)
+        try:
+            yield f"retry: {LIVE_RESULTS_RETRY_MS}\n" + format_event("snapshot", await snapshot())
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self._unsubscribe(exam_id, queue)
+
+    def stats(self) -> dict:
+        return {
+            "exams": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
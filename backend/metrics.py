@@ -0,0 +1,271 @@
+"""Request and Mongo metrics in Prometheus text format.
+
+``MetricsMiddleware`` records per-route latency histograms, in-flight
+gauges and response counts; ``MongoCommandListener`` is passed to the Motor
+client as an event listener and records per-collection, per-command
+latency and document counts, and ``MongoPoolListener`` times connection
+checkouts and tracks pool occupancy. ``render()`` produces the exposition text
+served on /metrics. Metrics are per process: with several workers each
+one is scraped separately.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_lock = threading.Lock()
+REGISTRY = []
+
+# Route template of the request being handled, for attributing Mongo commands
+current_route = contextvars.ContextVar('current_route', default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = defaultdict(float)
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with _lock:
+            self._values[labels] += amount
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value:g}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with _lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=HTTP_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        REGISTRY.append(self)
+
+    def observe(self, *labels, value: float):
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def samples(self):
+        names = self.labels + ("le",)
+        for labels, (counts, count, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(names, labels + (f'{bound:g}',))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {count}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total:g}"
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        for metric in REGISTRY:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route"))
+http_requests = Counter(
+    "http_requests_total", "Responses by route template and status code", ("method", "route", "status"))
+http_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method", "route"))
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency", ("collection", "command"), MONGO_BUCKETS)
+mongo_documents = Counter(
+    "mongo_documents_total", "Documents returned or written by Mongo commands", ("collection", "command"))
+mongo_command_failures = Counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error", ("collection", "command"))
+mongo_pool_checkout_wait = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool", (), MONGO_BUCKETS)
+mongo_pool_checkout_failures = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed", ("reason",))
+mongo_pool_checked_out = Gauge(
+    "mongo_pool_checked_out", "Pooled connections currently checked out")
+mongo_pool_connections = Gauge(
+    "mongo_pool_connections", "Open pooled connections")
+admission_queue_depth = Gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot", ("route",))
+admission_wait = Histogram(
+    "admission_wait_seconds", "Time admitted requests spent waiting for a slot", ("route",))
+admission_rejections = Counter(
+    "admission_rejections_total", "Requests answered 503 by admission control", ("route", "reason"))
+bcrypt_waiting = Gauge(
+    "bcrypt_pool_waiting", "Password hashes waiting for a bcrypt pool slot")
+bcrypt_running = Gauge(
+    "bcrypt_pool_running", "Password hashes currently running on the bcrypt pool")
+bcrypt_rejections = Counter(
+    "bcrypt_pool_rejections_total", "Password hashes rejected because the bcrypt queue was full")
+
+
+def route_template(app, scope) -> str:
+    """The matched route's path template, so ids do not become label values."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, fastapi_app=None):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.fastapi_app, scope)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method, route)
+        token = current_route.set(f"{method} {route}")
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_route.reset(token)
+            http_in_flight.dec(method, route)
+            http_request_duration.observe(method, route, value=time.perf_counter() - start)
+            http_requests.inc(method, route, str(status[0]))
+
+
+def _documents(command_name: str, reply) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return int(reply.get("n", 0))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command per collection; getMore is attributed to the cursor's collection."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "admin"
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "unknown")
+        mongo_command_duration.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+        documents = _documents(event.command_name, event.reply)
+        if documents:
+            mongo_documents.inc(collection, event.command_name, amount=documents)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "unknown")
+        mongo_command_duration.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+        mongo_command_failures.inc(collection, event.command_name)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Times connection checkouts and tracks pool occupancy.
+
+    The driver checks a connection out synchronously on the thread running
+    the operation, so the start of each checkout is kept thread-locally.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            mongo_pool_checkout_wait.observe(value=time.perf_counter() - started)
+            self._local.started = None
+        mongo_pool_checked_out.inc()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        mongo_pool_checkout_failures.inc(str(event.reason))
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec()
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc()
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec()
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
@@ -0,0 +1,98 @@
+"""Convert ISO-string timestamps left by older releases into BSON datetimes.
+
+Each collection is walked in ``_id`` order in batches, so an interrupted run
+simply resumes: documents already converted no longer match the ``$type:
+"string"`` filter. Every update is guarded on the old string value, so a
+document rewritten by the app mid-migration is left alone. Naive strings are
+taken as UTC, which is how pymongo stores naive datetimes.
+
+Run with ``python migrate_datetimes.py [--dry-run]``.
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_BATCH_SIZE = int(os.environ.get('MIGRATE_BATCH_SIZE', 1000))
+
+DATETIME_FIELDS = {
+    "users": ["created_at"],
+    "subjects": ["created_at"],
+    "exams": ["created_at", "start_time", "end_time"],
+    "student_exams": ["started_at", "submitted_at"],
+}
+
+
+def parse_timestamp(value: str):
+    """Parse an ISO string as stored by older releases; None when it is not one."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+async def migrate_field(db, collection: str, field: str, batch_size: int = MIGRATE_BATCH_SIZE,
+                        dry_run: bool = False) -> dict:
+    counts = {"converted": 0, "unparseable": 0}
+    last_id = None
+    while True:
+        query = {field: {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db[collection].find(query, {"_id": 1, field: 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return counts
+        last_id = batch[-1]["_id"]
+
+        updates = []
+        for doc in batch:
+            parsed = parse_timestamp(doc[field])
+            if parsed is None:
+                counts["unparseable"] += 1
+                logger.warning("%s %s: cannot parse %s=%r; left as is", collection, doc["_id"], field, doc[field])
+                continue
+            updates.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: parsed}}))
+
+        if updates and not dry_run:
+            result = await db[collection].bulk_write(updates, ordered=False)
+            counts["converted"] += result.modified_count
+        else:
+            counts["converted"] += len(updates)
+
+
+async def migrate(db, batch_size: int = MIGRATE_BATCH_SIZE, dry_run: bool = False) -> dict:
+    results = {}
+    for collection, fields in DATETIME_FIELDS.items():
+        for field in fields:
+            counts = await migrate_field(db, collection, field, batch_size, dry_run)
+            results[f"{collection}.{field}"] = counts
+            logger.info("%s.%s: %s%s", collection, field, counts, " (dry run)" if dry_run else "")
+    return results
+
+
+async def _main(dry_run: bool) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        results = await migrate(client[os.environ['DB_NAME']], dry_run=dry_run)
+        print(results)
+        return 1 if any(counts["unparseable"] for counts in results.values()) else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main('--dry-run' in sys.argv)))
@@ -0,0 +1,38 @@
+"""Motor connection-pool sizing and warm-up.
+
+The client is created in the app lifespan, so every uvicorn or gunicorn
+worker process opens its own pool after the fork rather than inheriting
+one. ``MONGO_POOL_BUDGET`` is the number of connections all workers on a
+host may hold together; it is split evenly over ``WEB_CONCURRENCY`` (the
+worker count both uvicorn and gunicorn read) unless ``MONGO_MAX_POOL_SIZE``
+sets the per-worker size directly. A request that cannot check out a
+connection within ``MONGO_WAIT_QUEUE_TIMEOUT_MS`` fails fast instead of
+queueing behind the pool.
+"""
+import asyncio
+import os
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+MONGO_POOL_BUDGET = int(os.environ.get('MONGO_POOL_BUDGET', 100))
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 0)) or max(1, MONGO_POOL_BUDGET // WEB_CONCURRENCY)
+MONGO_MIN_POOL_SIZE = min(int(os.environ.get('MONGO_MIN_POOL_SIZE', 10)), MONGO_MAX_POOL_SIZE)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+MONGO_POOL_WARMUP = os.environ.get('MONGO_POOL_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+
+
+def client_options() -> dict:
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+
+
+async def warm_up(client, connections: int = MONGO_MIN_POOL_SIZE):
+    """Open ``connections`` pooled connections before the first request needs one.
+
+    Concurrent pings each hold a connection, so the pool has to grow to
+    serve them; the driver would otherwise fill minPoolSize only in the
+    background, after the opening burst has already paid for the handshakes.
+    """
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(connections)))
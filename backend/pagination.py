@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+PAGE_SIZE_MAX = 1000
+PAGE_SIZE_DEFAULT = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when an ``after`` token cannot be decoded."""
+
+
+def encode_cursor(sort_value, doc_id: str) -> str:
+    """Build an opaque keyset token from the last row's sort value and id."""
+    if isinstance(sort_value, datetime):
+        value = {"d": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    raw = json.dumps([value, doc_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str):
+    # Both parts end up inside a Mongo filter, so only plain scalars are accepted;
+    # a dict here would otherwise be read as an operator expression
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, doc_id = json.loads(raw)
+        if not isinstance(doc_id, str):
+            raise InvalidCursor("cursor id must be a string")
+        if 'd' in value:
+            return datetime.fromisoformat(value['d']), doc_id
+        sort_value = value['v']
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(str(e))
+    if isinstance(sort_value, bool) or not isinstance(sort_value, (str, int, float)):
+        raise InvalidCursor("cursor value must be a string, number or datetime")
+    return sort_value, doc_id
+
+
+def keyset_filter(sort_field: str, direction: int, sort_value, doc_id: str) -> dict:
+    """Match rows strictly after (sort_value, doc_id) in (sort_field, id) order."""
+    op = '$lt' if direction == DESCENDING else '$gt'
+    return {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "id": {op: doc_id}},
+    ]}
+
+
+async def fetch_page(collection, query: dict, projection: dict, sort_field: str,
+                     direction: int = ASCENDING, after: str = None, limit: int = PAGE_SIZE_MAX):
+    """Return (docs, next_cursor) for one keyset page ordered by (sort_field, id).
+
+    The sort is always tie-broken on ``id`` so pages are stable even when
+    many rows share a timestamp; ``next_cursor`` is None on the last page.
+    """
+    if after:
+        sort_value, doc_id = decode_cursor(after)
+        query = {"$and": [query, keyset_filter(sort_field, direction, sort_value, doc_id)]}
+
+    docs = await collection.find(query, projection) \
+        .sort([(sort_field, direction), ("id", direction)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['id'])
+    return docs, next_cursor
+
+
+def slice_page(docs: list, sort_field: str, after: str = None, limit: int = PAGE_SIZE_MAX):
+    """``fetch_page`` over an in-memory list already in ascending (sort_field, id) order."""
+    start = 0
+    if after:
+        position = decode_cursor(after)
+        try:
+            start = next((i for i, d in enumerate(docs) if (d.get(sort_field), d['id']) > position), len(docs))
+        except TypeError as e:
+            # A well-formed token whose value cannot be ordered against this field
+            raise InvalidCursor(str(e))
+    page = docs[start:start + limit]
+    next_cursor = None
+    if start + limit < len(docs):
+        last = page[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['id'])
+    return page, next_cursor
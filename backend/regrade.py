@@ -0,0 +1,138 @@
+"""Background re-grading of an exam's graded submissions.
+
+``Regrader.submit`` records a job in the ``regrade_jobs`` collection and
+runs it as a background task, so the request returns at once and any
+worker can report the job's progress. Submissions are streamed from a
+cursor and scored a batch at a time with AnswerKey.grade_batch.
+
+Each changed score is written with its old score in the filter, and a
+student's materialized average only moves for writes that actually
+modified the attempt. A concurrent regrade or cascade delete that got
+there first therefore never has its change applied twice.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+from stats import bump_students, percentage
+
+REGRADE_BATCH_SIZE = int(os.environ.get('REGRADE_BATCH_SIZE', 1000))
+REGRADE_WRITE_CONCURRENCY = int(os.environ.get('REGRADE_WRITE_CONCURRENCY', 16))
+
+logger = logging.getLogger(__name__)
+
+
+class Regrader:
+    def __init__(self, batch_size: int = REGRADE_BATCH_SIZE, write_concurrency: int = REGRADE_WRITE_CONCURRENCY):
+        self.batch_size = batch_size
+        self.write_concurrency = write_concurrency
+        self._db = None
+        self._on_exam_done = None
+        self._tasks = set()
+
+    async def submit(self, exam_id: str, answer_key) -> dict:
+        """Record a re-grade of ``exam_id`` against ``answer_key`` and start it."""
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "exam_id": exam_id,
+            "status": "running",
+            "processed": 0,
+            "changed": 0,
+            "total": await self._db.student_exams.count_documents({"exam_id": exam_id, "status": "graded"}),
+            "elapsed_ms": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self._db.regrade_jobs.insert_one(job)
+        job.pop('_id', None)
+        task = asyncio.create_task(self._run(job['id'], exam_id, answer_key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def get(self, job_id: str):
+        return await self._db.regrade_jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def latest(self, exam_id: str):
+        return await self._db.regrade_jobs.find_one({"exam_id": exam_id}, {"_id": 0}, sort=[("created_at", -1)])
+
+    async def _write(self, doc: dict, score: int) -> bool:
+        result = await self._db.student_exams.update_one(
+            {"id": doc['id'], "status": "graded", "score": doc.get('score')},
+            {"$set": {"score": score}}
+        )
+        return result.modified_count == 1
+
+    async def _flush(self, batch: list, answer_key) -> int:
+        scores = answer_key.grade_batch([doc.get('answers') or [] for doc in batch])
+        changed = [(doc, score) for doc, score in zip(batch, scores.tolist()) if doc.get('score') != score]
+        deltas = {}
+        modified = 0
+        for i in range(0, len(changed), self.write_concurrency):
+            chunk = changed[i:i + self.write_concurrency]
+            written = await asyncio.gather(*(self._write(doc, score) for doc, score in chunk))
+            for (doc, score), ok in zip(chunk, written):
+                if not ok:
+                    continue
+                modified += 1
+                # Keep the student's materialized average in step with the new score
+                delta = percentage(score, doc.get('total_points')) - percentage(doc.get('score') or 0, doc.get('total_points'))
+                student = deltas.setdefault(doc['student_id'], {"percentage_sum": 0.0})
+                student['percentage_sum'] += delta
+        await bump_students(self._db, deltas)
+        return modified
+
+    async def _run(self, job_id: str, exam_id: str, answer_key):
+        started = time.perf_counter()
+        processed = changed = 0
+        try:
+            cursor = self._db.student_exams.find(
+                {"exam_id": exam_id, "status": "graded"},
+                {"_id": 0, "id": 1, "student_id": 1, "answers": 1, "score": 1, "total_points": 1}
+            ).batch_size(self.batch_size)
+            batch = []
+            async for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= self.batch_size:
+                    changed += await self._flush(batch, answer_key)
+                    processed += len(batch)
+                    batch = []
+                    await self._progress(job_id, processed, changed, started)
+            if batch:
+                changed += await self._flush(batch, answer_key)
+                processed += len(batch)
+            await self._progress(job_id, processed, changed, started, status="completed")
+            logger.info("Re-grade %s completed: %d processed, %d changed", exam_id, processed, changed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Re-grade %s failed", exam_id)
+            await self._progress(job_id, processed, changed, started, status="failed", error=str(e))
+        finally:
+            if self._on_exam_done is not None:
+                self._on_exam_done(exam_id)
+
+    async def _progress(self, job_id: str, processed: int, changed: int, started: float, **fields):
+        await self._db.regrade_jobs.update_one({"id": job_id}, {"$set": {
+            "processed": processed,
+            "changed": changed,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "updated_at": datetime.now(timezone.utc),
+            **fields,
+        }})
+
+    def start(self, db, on_exam_done=None):
+        """``on_exam_done(exam_id)`` runs once a re-grade has finished or failed."""
+        self._db = db
+        self._on_exam_done = on_exam_done
+
+    async def stop(self):
+        # An interrupted re-grade stays "running"; re-grading again is safe
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
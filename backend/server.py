@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -10,26 +11,118 @@ from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional, Literal
 import uuid
 from datetime import datetime, timezone, timedelta
-import bcrypt
 import jwt
+from password_hashing import PasswordHasher, PasswordPoolBusy
+from indexes import ensure_indexes
+from exam_cache import ExamPaperCache
+from exam_bundle import ExamBundle
+from item_analysis import ItemAnalysisCache, analyze_exam
+from regrade import Regrader
+from exports import stream_results_csv, stream_results_ndjson
+from pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, InvalidCursor, fetch_page, slice_page
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+import stats
+import analytics
+import fast_json
+import metrics
+from slow_queries import SlowQueryLog
+from autosave import AutosaveBuffer, AutosaveBufferFull
+from submission_queue import SubmissionQueue
+from user_cache import UserProfileCache
+from available_exams import AvailableExamsCache
+from cascade_delete import CascadeDeleter
+from live_results import LiveResults
+from admission import AdmissionControl, AdmissionMiddleware
+import mongo_pool
+from contextlib import asynccontextmanager
+from pymongo.errors import WaitQueueTimeoutError
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened per worker process by the app lifespan
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Commands slower than SLOW_QUERY_MS are logged by shape with their calling route
+slow_query_log = SlowQueryLog()
+client = None
+db = None
+
+def connect():
+    global client, db
+    client = AsyncIOMotorClient(
+        mongo_url, tz_aware=True,
+        event_listeners=[metrics.MongoCommandListener(), metrics.MongoPoolListener(), slow_query_log],
+        **mongo_pool.client_options()
+    )
+    db = client[os.environ['DB_NAME']]
 
 # JWT Settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
+# EventSource cannot send headers, so the live stream takes a short-lived token in its URL
+LIVE_TOKEN_SECONDS = int(os.environ.get('LIVE_TOKEN_SECONDS', 600))
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# bcrypt work runs off the event loop on a bounded pool
+password_hasher = PasswordHasher()
+
+# Question papers, shared by every student sitting the same exam
+exam_papers = ExamPaperCache()
+
+# Per-exam item analyses, dropped whenever a submission is graded
+item_analyses = ItemAnalysisCache()
+
+# In-progress answers, coalesced in memory and flushed to Mongo in bulk
+autosave_buffer = AutosaveBuffer()
+
+# Submissions accepted with 202 and graded by background workers
+submission_queue = SubmissionQueue()
+
+# User profiles for requests whose token predates the name/class_name claims
+user_profiles = UserProfileCache()
+
+# Student exam lists per class, expiring at the next start/end time
+available_exams = AvailableExamsCache()
+
+# Questions and attempts of deleted exams are removed in background batches
+cascade_deleter = CascadeDeleter()
+
+# Re-grades run as background jobs whose progress any worker can report
+regrader = Regrader()
+
+# Per-exam attempt events pushed to proctors over server-sent events
+live_results = LiveResults()
+
+# Concurrency limits and per-class rate limits for the exam-open burst
+admission = AdmissionControl()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect()
+    if mongo_pool.MONGO_POOL_WARMUP:
+        await mongo_pool.warm_up(client)
+    await ensure_indexes(db)
+    await stats.ensure_stats(db)
+    autosave_buffer.start(db)
+    submission_queue.start(db, grade_submission)
+    slow_query_log.start(db)
+    cascade_deleter.start(db, on_exam_done=invalidate_exam_caches)
+    regrader.start(db, on_exam_done=lambda exam_id: live_results.reset(exam_id, "regraded"))
+    yield
+    await regrader.stop()
+    await cascade_deleter.stop()
+    await slow_query_log.stop()
+    await submission_queue.stop()
+    await autosave_buffer.stop()
+    client.close()
+    password_hasher.shutdown()
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # ============ Models ============
@@ -120,6 +213,7 @@ class StudentExam(BaseModel):
     exam_id: str
     student_id: str
     student_name: str
+    class_name: Optional[str] = None
     exam_title: str
     subject_name: str
     answers: List[Answer] = []
@@ -132,38 +226,123 @@ class StudentExam(BaseModel):
 class ExamSubmission(BaseModel):
     answers: List[Answer]
 
+class AnswerDelta(BaseModel):
+    answers: List[Answer]
+
 # ============ Auth Helper Functions ============
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.verify(password, hashed)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def create_token(user_id: str, email: str, role: str) -> str:
+def create_token(user_id: str, email: str, role: str, name: str, class_name: Optional[str] = None) -> str:
     payload = {
         'user_id': user_id,
         'email': email,
         'role': role,
+        'name': name,
+        'class_name': class_name,
         'exp': datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def create_live_token(user_id: str, exam_id: str) -> str:
+    payload = {
+        'user_id': user_id,
+        'scope': f"live:{exam_id}",
+        'exp': datetime.now(timezone.utc) + timedelta(seconds=LIVE_TOKEN_SECONDS)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_token(token: str) -> dict:
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    payload = decode_token(credentials.credentials)
+    # Scoped tokens (the live stream's) only open the route they were issued for
+    if 'scope' in payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+async def load_user_profile(user_id: str) -> Optional[dict]:
+    return await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+
+async def get_user_claims(current_user: dict) -> dict:
+    # Tokens carry name and class_name; only older tokens need a (cached) lookup
+    if 'name' in current_user:
+        return current_user
+    profile = await user_profiles.get(current_user['user_id'], load_user_profile)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User not found")
+    return profile
+
+def request_class_name(scope) -> Optional[str]:
+    # Admission control runs before routing and auth, so it reads the class from the token itself
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get('class_name')
+    except jwt.InvalidTokenError:
+        return None
+
 async def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
+def invalidate_exam_caches(exam_id: str):
+    # Anything derived from an exam's questions must be rebuilt when they change
+    exam_papers.invalidate(exam_id)
+    item_analyses.invalidate(exam_id)
+
+async def load_exam_questions(exam_id: str) -> list:
+    # Papers are cached, so a made-up exam id must fail here rather than cache an empty one
+    if not await db.exams.find_one({"id": exam_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return await db.questions.find({"exam_id": exam_id}, {"_id": 0}).sort("order", 1).to_list(1000)
+
+async def paginate(response: Response, collection, query: dict, sort_field: str, direction: int,
+                   after: Optional[str], limit: int, model=None):
+    # The body stays a plain list; the next page's token travels in a header.
+    # With fast JSON enabled the page skips response_model validation.
+    fast = model is not None and fast_json.enabled()
+    projection = fast_json.projection(model) if fast else {"_id": 0}
+    try:
+        docs, next_cursor = await fetch_page(collection, query, projection, sort_field, direction, after, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return page_response(response, docs, next_cursor, model)
+
+def page_response(response: Response, docs: list, next_cursor: Optional[str], model=None):
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    if model is not None and fast_json.enabled():
+        return fast_json.list_response(docs, model, headers)
+    if headers:
+        response.headers.update(headers)
+    return docs
+
+async def load_available_exams(class_name: Optional[str], now: datetime) -> list:
+    query = {"$and": [
+        {"$or": [{"class_name": class_name}, {"class_name": None}]},
+        {"$or": [{"end_time": None}, {"end_time": {"$gte": now}}]},
+    ]}
+    return await db.exams.find(query, fast_json.projection(Exam)).sort([("created_at", ASCENDING), ("id", ASCENDING)]).to_list(None)
+
 # ============ Auth Routes ============
 
 @api_router.post("/auth/register")
@@ -178,12 +357,13 @@ async def register(user_data: UserCreate):
     user = User(**user_dict)
     
     doc = user.model_dump()
-    doc['password_hash'] = hash_password(user_data.password)
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc['password_hash'] = await hash_password(user_data.password)
     
     await db.users.insert_one(doc)
+    if user.role == 'student':
+        await stats.bump(db, total_students=1)
     
-    token = create_token(user.id, user.email, user.role)
+    token = create_token(user.id, user.email, user.role, user.name, user.class_name)
     return {"token": token, "user": user}
 
 @api_router.post("/auth/login")
@@ -192,10 +372,10 @@ async def login(login_data: UserLogin):
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(login_data.password, user_doc['password_hash']):
+    if not await verify_password(login_data.password, user_doc['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_token(user_doc['id'], user_doc['email'], user_doc['role'])
+    token = create_token(user_doc['id'], user_doc['email'], user_doc['role'], user_doc['name'], user_doc.get('class_name'))
     user_doc.pop('password_hash')
     user_doc.pop('_id', None)
     
@@ -203,7 +383,7 @@ async def login(login_data: UserLogin):
 
 @api_router.get("/auth/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"id": current_user['user_id']}, {"_id": 0, "password_hash": 0})
+    user_doc = await user_profiles.get(current_user['user_id'], load_user_profile)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     return user_doc
@@ -214,24 +394,37 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 async def create_subject(subject_data: SubjectCreate, current_user: dict = Depends(get_admin_user)):
     subject = Subject(**subject_data.model_dump())
     doc = subject.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.subjects.insert_one(doc)
+    await stats.bump(db, total_subjects=1)
     return subject
 
 @api_router.get("/subjects", response_model=List[Subject])
-async def get_subjects(current_user: dict = Depends(get_current_user)):
-    subjects = await db.subjects.find({}, {"_id": 0}).to_list(1000)
-    for s in subjects:
-        if isinstance(s.get('created_at'), str):
-            s['created_at'] = datetime.fromisoformat(s['created_at'])
-    return subjects
-
-@api_router.delete("/subjects/{subject_id}")
+async def get_subjects(
+    response: Response,
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_MAX, ge=1, le=PAGE_SIZE_MAX),
+    current_user: dict = Depends(get_current_user)
+):
+    return await paginate(response, db.subjects, {}, "created_at", ASCENDING, after, limit, Subject)
+
+@api_router.delete("/subjects/{subject_id}", status_code=202)
 async def delete_subject(subject_id: str, current_user: dict = Depends(get_admin_user)):
     result = await db.subjects.delete_one({"id": subject_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Subject not found")
-    return {"message": "Subject deleted"}
+    await stats.bump(db, total_subjects=-1)
+    
+    # The subject's exams disappear now; their questions and attempts go in the background
+    exam_ids = [e['id'] async for e in db.exams.find({"subject_id": subject_id}, {"_id": 0, "id": 1})]
+    if exam_ids:
+        deleted = await db.exams.delete_many({"id": {"$in": exam_ids}})
+        await stats.bump(db, total_exams=-deleted.deleted_count)
+        for exam_id in exam_ids:
+            invalidate_exam_caches(exam_id)
+            live_results.reset(exam_id, "deleted")
+        available_exams.invalidate()
+    job = await cascade_deleter.submit("subject", subject_id, exam_ids)
+    return {"message": "Subject deleted", "job_id": job['id'], "status": job['status']}
 
 # ============ Exam Routes ============
 
@@ -248,81 +441,79 @@ async def create_exam(exam_data: ExamCreate, current_user: dict = Depends(get_ad
     exam = Exam(**exam_dict)
     
     doc = exam.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    if doc.get('start_time'):
-        doc['start_time'] = doc['start_time'].isoformat()
-    if doc.get('end_time'):
-        doc['end_time'] = doc['end_time'].isoformat()
-    
     await db.exams.insert_one(doc)
+    available_exams.invalidate()
+    await stats.bump(db, total_exams=1)
     return exam
 
 @api_router.get("/exams", response_model=List[Exam])
-async def get_exams(current_user: dict = Depends(get_current_user)):
+async def get_exams(
+    response: Response,
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_MAX, ge=1, le=PAGE_SIZE_MAX),
+    current_user: dict = Depends(get_current_user)
+):
     if current_user['role'] == 'admin':
-        exams = await db.exams.find({}, {"_id": 0}).to_list(1000)
-    else:
-        # Students only see available exams
-        user = await db.users.find_one({"id": current_user['user_id']})
-        now = datetime.now(timezone.utc).isoformat()
-        exams = await db.exams.find({
-            "$or": [
-                {"class_name": user.get('class_name')},
-                {"class_name": None}
-            ],
-            "$or": [
-                {"end_time": None},
-                {"end_time": {"$gte": now}}
-            ]
-        }, {"_id": 0}).to_list(1000)
-    
-    for e in exams:
-        if isinstance(e.get('created_at'), str):
-            e['created_at'] = datetime.fromisoformat(e['created_at'])
-        if isinstance(e.get('start_time'), str):
-            e['start_time'] = datetime.fromisoformat(e['start_time'])
-        if isinstance(e.get('end_time'), str):
-            e['end_time'] = datetime.fromisoformat(e['end_time'])
-    return exams
+        return await paginate(response, db.exams, {}, "created_at", ASCENDING, after, limit, Exam)
+    
+    # Students only see available exams, served from the per-class cache
+    user = await get_user_claims(current_user)
+    exams = await available_exams.get(user.get('class_name'), load_available_exams)
+    try:
+        docs, next_cursor = slice_page(exams, "created_at", after, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return page_response(response, docs, next_cursor, Exam)
 
 @api_router.get("/exams/history", response_model=List[StudentExam])
-async def get_exam_history(current_user: dict = Depends(get_current_user)):
+async def get_exam_history(
+    response: Response,
+    exam_id: Optional[str] = None,
+    class_name: Optional[str] = None,
+    status_filter: Optional[Literal["in_progress", "submitted", "graded"]] = Query(None, alias="status"),
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    current_user: dict = Depends(get_current_user)
+):
     if current_user['role'] == 'student':
         query = {"student_id": current_user['user_id']}
     else:
         query = {}
+    if exam_id:
+        query['exam_id'] = exam_id
+    if class_name:
+        query['class_name'] = class_name
+    if status_filter:
+        query['status'] = status_filter
     
-    exams = await db.student_exams.find(query, {"_id": 0}).sort("started_at", -1).to_list(1000)
-    
-    for e in exams:
-        if isinstance(e.get('started_at'), str):
-            e['started_at'] = datetime.fromisoformat(e['started_at'])
-        if isinstance(e.get('submitted_at'), str):
-            e['submitted_at'] = datetime.fromisoformat(e['submitted_at'])
-    
-    return exams
+    return await paginate(response, db.student_exams, query, "started_at", DESCENDING, after, limit, StudentExam)
 
 @api_router.get("/exams/{exam_id}", response_model=Exam)
 async def get_exam(exam_id: str, current_user: dict = Depends(get_current_user)):
     exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
-    if isinstance(exam.get('created_at'), str):
-        exam['created_at'] = datetime.fromisoformat(exam['created_at'])
-    if isinstance(exam.get('start_time'), str):
-        exam['start_time'] = datetime.fromisoformat(exam['start_time'])
-    if isinstance(exam.get('end_time'), str):
-        exam['end_time'] = datetime.fromisoformat(exam['end_time'])
     return exam
 
-@api_router.delete("/exams/{exam_id}")
+@api_router.delete("/exams/{exam_id}", status_code=202)
 async def delete_exam(exam_id: str, current_user: dict = Depends(get_admin_user)):
-    # Delete exam and its questions
-    await db.questions.delete_many({"exam_id": exam_id})
+    # The exam disappears now; its questions and attempts go in the background
     result = await db.exams.delete_one({"id": exam_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Exam not found")
-    return {"message": "Exam deleted"}
+    invalidate_exam_caches(exam_id)
+    live_results.reset(exam_id, "deleted")
+    available_exams.invalidate()
+    await stats.bump(db, total_exams=-1)
+    job = await cascade_deleter.submit("exam", exam_id, [exam_id])
+    return {"message": "Exam deleted", "job_id": job['id'], "status": job['status']}
+
+@api_router.get("/delete-jobs/{job_id}")
+async def get_delete_job(job_id: str, current_user: dict = Depends(get_admin_user)):
+    job = await cascade_deleter.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Delete job not found")
+    return job
 
 # ============ Question Routes ============
 
@@ -338,24 +529,42 @@ async def create_question(exam_id: str, question_data: QuestionCreate, current_u
     question = Question(**question_dict)
     
     await db.questions.insert_one(question.model_dump())
+    invalidate_exam_caches(exam_id)
     return question
 
 @api_router.get("/exams/{exam_id}/questions", response_model=List[Question])
 async def get_questions(exam_id: str, current_user: dict = Depends(get_current_user)):
-    questions = await db.questions.find({"exam_id": exam_id}, {"_id": 0}).sort("order", 1).to_list(1000)
+    paper = await exam_papers.get(exam_id, load_exam_questions)
     
     # Hide correct answers for students
     if current_user['role'] == 'student':
-        for q in questions:
-            q.pop('correct_answer', None)
-    
-    return questions
+        return paper.student_questions
+    
+    return paper.questions
+
+@api_router.get("/exams/{exam_id}/bundle")
+async def get_exam_bundle(exam_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    # The exam and its student-safe questions in one body, built once per cached paper;
+    # exams are never edited and question changes drop the paper, so the bundle lives as long as it does
+    paper = await exam_papers.get(exam_id, load_exam_questions)
+    bundle = paper.bundle
+    if bundle is None:
+        exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
+        if not exam:
+            raise HTTPException(status_code=404, detail="Exam not found")
+        bundle = ExamBundle({
+            "exam": Exam(**exam).model_dump(mode="json"),
+            "questions": [Question(**q).model_dump(mode="json") for q in paper.student_questions],
+        })
+        exam_papers.attach_bundle(paper, bundle)
+    return bundle.response(request.headers)
 
 @api_router.delete("/questions/{question_id}")
 async def delete_question(question_id: str, current_user: dict = Depends(get_admin_user)):
-    result = await db.questions.delete_one({"id": question_id})
-    if result.deleted_count == 0:
+    question = await db.questions.find_one_and_delete({"id": question_id}, {"_id": 0, "exam_id": 1})
+    if not question:
         raise HTTPException(status_code=404, detail="Question not found")
+    invalidate_exam_caches(question['exam_id'])
     return {"message": "Question deleted"}
 
 # ============ Student Exam Routes ============
@@ -365,35 +574,38 @@ async def start_exam(exam_id: str, current_user: dict = Depends(get_current_user
     if current_user['role'] != 'student':
         raise HTTPException(status_code=403, detail="Only students can take exams")
     
-    # Check if already started
-    existing = await db.student_exams.find_one({
-        "exam_id": exam_id,
-        "student_id": current_user['user_id'],
-        "status": {"$in": ["in_progress", "submitted", "graded"]}
-    })
-    if existing:
-        raise HTTPException(status_code=400, detail="Exam already started or completed")
-    
     # Get exam details
-    exam = await db.exams.find_one({"id": exam_id})
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "title": 1, "subject_name": 1, "total_points": 1})
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     
-    user = await db.users.find_one({"id": current_user['user_id']})
+    user = await get_user_claims(current_user)
     
     student_exam = StudentExam(
         exam_id=exam_id,
         student_id=current_user['user_id'],
         student_name=user['name'],
+        class_name=user.get('class_name'),
         exam_title=exam['title'],
         subject_name=exam['subject_name'],
         total_points=exam['total_points']
     )
     
-    doc = student_exam.model_dump()
-    doc['started_at'] = doc['started_at'].isoformat()
+    # One attempt per (exam_id, student_id), enforced by the unique index: the upsert
+    # only inserts when no attempt exists, so double clicks and retries cannot race
+    try:
+        result = await db.student_exams.update_one(
+            {"exam_id": exam_id, "student_id": current_user['user_id']},
+            {"$setOnInsert": student_exam.model_dump()},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        result = None
+    if result is None or result.upserted_id is None:
+        raise HTTPException(status_code=400, detail="Exam already started or completed")
     
-    await db.student_exams.insert_one(doc)
+    await stats.bump_student(db, current_user['user_id'], in_progress=1)
+    live_results.publish(exam_id, "started", student_exam.model_dump(exclude={"answers"}))
     return student_exam
 
 @api_router.post("/exams/{exam_id}/submit")
@@ -401,113 +613,376 @@ async def submit_exam(exam_id: str, submission: ExamSubmission, current_user: di
     if current_user['role'] != 'student':
         raise HTTPException(status_code=403, detail="Only students can submit exams")
     
-    # Get student exam
-    student_exam = await db.student_exams.find_one({
-        "exam_id": exam_id,
-        "student_id": current_user['user_id'],
-        "status": "in_progress"
-    })
-    
-    if not student_exam:
-        raise HTTPException(status_code=404, detail="Exam not started or already submitted")
-    
-    # Get questions with correct answers
-    questions = await db.questions.find({"exam_id": exam_id}, {"_id": 0}).to_list(1000)
-    questions_dict = {q['id']: q for q in questions}
-    
-    # Calculate score
-    total_score = 0
-    for answer in submission.answers:
-        question = questions_dict.get(answer.question_id)
-        if question and question['question_type'] == 'multiple_choice':
-            if answer.answer_text == question.get('correct_answer'):
-                total_score += question['points']
-    
-    # Update student exam
-    now = datetime.now(timezone.utc).isoformat()
-    await db.student_exams.update_one(
-        {"id": student_exam['id']},
+    # Grade against the compiled answer key; only a cache miss touches questions
+    paper = await exam_papers.get(exam_id, load_exam_questions)
+    total_score = paper.answer_key.grade(submission.answers)
+    
+    # Record the submission, guarded on the attempt still being in progress
+    autosave_buffer.discard(exam_id, current_user['user_id'])
+    now = datetime.now(timezone.utc)
+    student_exam = await db.student_exams.find_one_and_update(
+        {
+            "exam_id": exam_id,
+            "student_id": current_user['user_id'],
+            "status": "in_progress"
+        },
         {"$set": {
             "answers": [a.model_dump() for a in submission.answers],
             "score": total_score,
             "submitted_at": now,
             "status": "graded"
-        }}
+        }, "$unset": {"draft_answers": ""}},
+        projection={"_id": 0, "id": 1, "total_points": 1}
     )
     
+    if not student_exam:
+        raise HTTPException(status_code=404, detail="Exam not started or already submitted")
+    
+    item_analyses.invalidate(exam_id)
+    await stats.bump(db, total_submissions=1)
+    await stats.bump_student(
+        db, current_user['user_id'],
+        in_progress=-1, completed=1, graded_count=1,
+        percentage_sum=stats.percentage(total_score, student_exam['total_points'])
+    )
+    live_results.publish(exam_id, "graded", {
+        "id": student_exam['id'], "student_id": current_user['user_id'], "status": "graded",
+        "score": total_score, "total_points": student_exam['total_points'], "submitted_at": now
+    })
+    
     return {"score": total_score, "total_points": student_exam['total_points']}
 
-@api_router.get("/exams/{exam_id}/results")
-async def get_exam_results(exam_id: str, current_user: dict = Depends(get_admin_user)):
-    results = await db.student_exams.find({"exam_id": exam_id}, {"_id": 0}).to_list(1000)
-    return results
-
-# ============ Dashboard Routes ============
+@api_router.post("/exams/{exam_id}/submissions", status_code=202)
+async def enqueue_submission(exam_id: str, submission: ExamSubmission, current_user: dict = Depends(get_current_user)):
+    if current_user['role'] != 'student':
+        raise HTTPException(status_code=403, detail="Only students can submit exams")
+    
+    # Durably record the raw answers first; grading happens off the request path
+    autosave_buffer.discard(exam_id, current_user['user_id'])
+    now = datetime.now(timezone.utc)
+    student_exam = await db.student_exams.find_one_and_update(
+        {
+            "exam_id": exam_id,
+            "student_id": current_user['user_id'],
+            "status": "in_progress"
+        },
+        {"$set": {
+            "answers": [a.model_dump() for a in submission.answers],
+            "submitted_at": now,
+            "status": "submitted"
+        }, "$unset": {"draft_answers": ""}},
+        projection={"_id": 0, "id": 1}
+    )
+    
+    if not student_exam:
+        raise HTTPException(status_code=404, detail="Exam not started or already submitted")
+    
+    await stats.bump(db, total_submissions=1)
+    await stats.bump_student(db, current_user['user_id'], in_progress=-1, completed=1)
+    live_results.publish(exam_id, "submitted", {
+        "id": student_exam['id'], "student_id": current_user['user_id'], "status": "submitted", "submitted_at": now
+    })
+    submission_queue.enqueue(student_exam['id'])
+    
+    return {"submission_id": student_exam['id'], "status": "submitted"}
 
-@api_router.get("/dashboard/admin")
-async def get_admin_dashboard(current_user: dict = Depends(get_admin_user)):
-    total_exams = await db.exams.count_documents({})
-    total_subjects = await db.subjects.count_documents({})
-    total_students = await db.users.count_documents({"role": "student"})
-    total_submissions = await db.student_exams.count_documents({"status": {"$in": ["submitted", "graded"]}})
+async def grade_submission(submission_id: str):
+    student_exam = await db.student_exams.find_one(
+        {"id": submission_id, "status": "submitted"},
+        {"_id": 0, "exam_id": 1, "student_id": 1, "answers": 1, "total_points": 1}
+    )
+    if not student_exam:
+        return
     
-    return {
-        "total_exams": total_exams,
-        "total_subjects": total_subjects,
-        "total_students": total_students,
-        "total_submissions": total_submissions
+    paper = await exam_papers.get(student_exam['exam_id'], load_exam_questions)
+    score = paper.answer_key.grade(student_exam.get('answers') or [])
+    result = await db.student_exams.update_one(
+        {"id": submission_id, "status": "submitted"},
+        {"$set": {"score": score, "status": "graded"}}
+    )
+    if result.modified_count:
+        item_analyses.invalidate(student_exam['exam_id'])
+        await stats.bump_student(
+            db, student_exam['student_id'],
+            graded_count=1, percentage_sum=stats.percentage(score, student_exam['total_points'])
+        )
+        live_results.publish(student_exam['exam_id'], "graded", {
+            "id": submission_id, "student_id": student_exam['student_id'], "status": "graded",
+            "score": score, "total_points": student_exam['total_points']
+        })
+
+@api_router.get("/submissions/queue")
+async def get_submission_queue_stats(current_user: dict = Depends(get_admin_user)):
+    return submission_queue.stats()
+
+@api_router.get("/submissions/{submission_id}")
+async def get_submission_status(submission_id: str, current_user: dict = Depends(get_current_user)):
+    query = {"id": submission_id}
+    if current_user['role'] == 'student':
+        query['student_id'] = current_user['user_id']
+    student_exam = await db.student_exams.find_one(
+        query, {"_id": 0, "id": 1, "exam_id": 1, "status": 1, "score": 1, "total_points": 1}
+    )
+    if not student_exam:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    
+    result = {
+        "submission_id": student_exam['id'],
+        "exam_id": student_exam['exam_id'],
+        "status": student_exam['status'],
     }
+    if student_exam['status'] == 'graded':
+        result['score'] = student_exam.get('score')
+        result['total_points'] = student_exam['total_points']
+    return result
 
-@api_router.get("/dashboard/student")
-async def get_student_dashboard(current_user: dict = Depends(get_current_user)):
+@api_router.patch("/exams/{exam_id}/answers")
+async def autosave_answers(exam_id: str, delta: AnswerDelta, current_user: dict = Depends(get_current_user)):
     if current_user['role'] != 'student':
-        raise HTTPException(status_code=403, detail="Student access only")
+        raise HTTPException(status_code=403, detail="Only students can save answers")
+    
+    # Question ids become field names in draft_answers, so only accept ones on the paper
+    paper = await exam_papers.get(exam_id, load_exam_questions)
+    answers = {a.question_id: a.answer_text for a in delta.answers}
+    if not answers.keys() <= paper.answer_key.index.keys():
+        raise HTTPException(status_code=400, detail="Unknown question id")
+    
+    # An attempt already in the buffer was checked when it entered and is dropped on submit
+    if not autosave_buffer.is_pending(exam_id, current_user['user_id']):
+        student_exam = await db.student_exams.find_one({
+            "exam_id": exam_id,
+            "student_id": current_user['user_id'],
+            "status": "in_progress"
+        }, {"_id": 1})
+        if student_exam is None:
+            raise HTTPException(status_code=404, detail="Exam not started or already submitted")
     
-    completed = await db.student_exams.count_documents({
-        "student_id": current_user['user_id'],
-        "status": {"$in": ["submitted", "graded"]}
+    try:
+        autosave_buffer.add(exam_id, current_user['user_id'], answers)
+    except AutosaveBufferFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+    live_results.publish(exam_id, "autosaved", {
+        "student_id": current_user['user_id'], "question_ids": list(answers), "saved_at": datetime.now(timezone.utc)
     })
+    return {"saved": len(answers)}
+
+@api_router.get("/exams/{exam_id}/answers")
+async def get_saved_answers(exam_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user['role'] != 'student':
+        raise HTTPException(status_code=403, detail="Only students can load saved answers")
     
-    in_progress = await db.student_exams.count_documents({
+    student_exam = await db.student_exams.find_one({
+        "exam_id": exam_id,
         "student_id": current_user['user_id'],
         "status": "in_progress"
-    })
+    }, {"_id": 0, "draft_answers": 1})
+    if student_exam is None:
+        raise HTTPException(status_code=404, detail="Exam not started or already submitted")
     
-    # Calculate average score
-    graded_exams = await db.student_exams.find({
-        "student_id": current_user['user_id'],
-        "status": "graded",
-        "score": {"$exists": True}
-    }, {"_id": 0, "score": 1, "total_points": 1}).to_list(1000)
+    answers = {**student_exam.get('draft_answers', {}), **autosave_buffer.pending_for(exam_id, current_user['user_id'])}
+    return {"answers": [{"question_id": qid, "answer_text": text} for qid, text in answers.items()]}
+
+@api_router.get("/exams/{exam_id}/results")
+async def get_exam_results(
+    exam_id: str,
+    response: Response,
+    class_name: Optional[str] = None,
+    status_filter: Optional[Literal["in_progress", "submitted", "graded"]] = Query(None, alias="status"),
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    current_user: dict = Depends(get_admin_user)
+):
+    query = {"exam_id": exam_id}
+    if class_name:
+        query['class_name'] = class_name
+    if status_filter:
+        query['status'] = status_filter
+    return await paginate(response, db.student_exams, query, "started_at", DESCENDING, after, limit, StudentExam)
+
+@api_router.post("/exams/{exam_id}/live/token")
+async def issue_live_token(exam_id: str, current_user: dict = Depends(get_admin_user)):
+    # Passed as ?token= to EventSource; only checked when a connection opens,
+    # so the client fetches a new one if a reconnect is refused
+    return {"token": create_live_token(current_user['user_id'], exam_id), "expires_in": LIVE_TOKEN_SECONDS}
+
+async def get_live_stream_user(
+    exam_id: str,
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> dict:
+    if token:
+        payload = decode_token(token)
+        if payload.get('scope') != f"live:{exam_id}":
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return payload
+    if credentials is None:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    return await get_admin_user(await get_current_user(credentials))
+
+@api_router.get("/exams/{exam_id}/live")
+async def stream_live_results(exam_id: str, current_user: dict = Depends(get_live_stream_user)):
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "id": 1})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    
+    # One read for the snapshot; everything after it is pushed as it happens
+    async def snapshot():
+        attempts = await db.student_exams.find(
+            {"exam_id": exam_id}, {"_id": 0, "answers": 0, "draft_answers": 0}
+        ).sort("started_at", DESCENDING).to_list(None)
+        return {"exam_id": exam_id, "attempts": attempts}
+    
+    return StreamingResponse(
+        live_results.stream(exam_id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/live-results/stats")
+async def get_live_results_stats(current_user: dict = Depends(get_admin_user)):
+    return live_results.stats()
+
+@api_router.get("/exams/{exam_id}/results/export")
+async def export_exam_results(
+    exam_id: str,
+    format: Literal["csv", "ndjson"] = "csv",
+    include_answers: bool = Query(False),
+    current_user: dict = Depends(get_admin_user)
+):
+    projection = {"_id": 0, "draft_answers": 0}
+    if not include_answers:
+        projection["answers"] = 0
+    cursor = db.student_exams.find({"exam_id": exam_id}, projection).batch_size(1000)
+    
+    if format == "ndjson":
+        body = stream_results_ndjson(cursor)
+        media_type = "application/x-ndjson"
+    else:
+        question_ids = None
+        if include_answers:
+            paper = await exam_papers.get(exam_id, load_exam_questions)
+            question_ids = [q['id'] for q in paper.questions]
+        body = stream_results_csv(cursor, question_ids)
+        media_type = "text/csv; charset=utf-8"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="results-{exam_id}.{format}"'}
+    )
+
+@api_router.post("/exams/{exam_id}/regrade", status_code=status.HTTP_202_ACCEPTED)
+async def regrade_exam_results(exam_id: str, current_user: dict = Depends(get_admin_user)):
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "id": 1})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
     
-    avg_score = 0
-    if graded_exams:
-        total_percentage = sum((e['score'] / e['total_points'] * 100) for e in graded_exams)
-        avg_score = total_percentage / len(graded_exams)
+    # Recompile from the stored questions in case the key was corrected outside the API
+    invalidate_exam_caches(exam_id)
+    paper = await exam_papers.get(exam_id, load_exam_questions)
+    job = await regrader.submit(exam_id, paper.answer_key)
+    return {"job_id": job['id'], "status": job['status'], "total": job['total']}
+
+@api_router.get("/exams/{exam_id}/item-analysis")
+async def get_item_analysis(exam_id: str, current_user: dict = Depends(get_admin_user)):
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "id": 1})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    
+    paper = await exam_papers.get(exam_id, load_exam_questions)
+    return await item_analyses.get(exam_id, lambda exam_id: analyze_exam(db, exam_id, paper))
+
+@api_router.get("/exams/{exam_id}/regrade")
+async def get_regrade_progress(exam_id: str, current_user: dict = Depends(get_admin_user)):
+    job = await regrader.latest(exam_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No re-grade has run for this exam")
+    return job
+
+@api_router.get("/regrade-jobs/{job_id}")
+async def get_regrade_job(job_id: str, current_user: dict = Depends(get_admin_user)):
+    job = await regrader.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-grade job not found")
+    return job
+
+# ============ Dashboard Routes ============
+
+@api_router.get("/dashboard/admin")
+async def get_admin_dashboard(current_user: dict = Depends(get_admin_user)):
+    return await stats.read_admin_stats(db)
+
+@api_router.get("/dashboard/student")
+async def get_student_dashboard(current_user: dict = Depends(get_current_user)):
+    if current_user['role'] != 'student':
+        raise HTTPException(status_code=403, detail="Student access only")
     
+    return await stats.read_student_stats(db, current_user['user_id'])
+
+@api_router.post("/dashboard/reconcile")
+async def reconcile_dashboard(current_user: dict = Depends(get_admin_user)):
+    return await stats.reconcile(db)
+
+# ============ Analytics Routes ============
+
+@api_router.get("/analytics/scores")
+async def get_score_analytics(
+    group_by: Literal["student", "class", "subject"] = "class",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_admin_user)
+):
+    return await analytics.score_summary(db, group_by, start, end)
+
+# ============ Cache Routes ============
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_admin_user)):
     return {
-        "completed_exams": completed,
-        "in_progress": in_progress,
-        "average_score": round(avg_score, 2)
+        "exam_papers": exam_papers.stats(),
+        "autosave": autosave_buffer.stats(),
+        "user_profiles": user_profiles.stats(),
+        "available_exams": available_exams.stats(),
+        "item_analyses": item_analyses.stats()
     }
 
+@api_router.get("/admission/stats")
+async def get_admission_stats(current_user: dict = Depends(get_admin_user)):
+    # Login is admitted here and then queues again for a bcrypt slot
+    return {**admission.stats(), "password_pool": password_hasher.stats()}
+
+@api_router.get("/slow-queries")
+async def get_slow_queries(current_user: dict = Depends(get_admin_user)):
+    return slow_query_log.stats()
+
 # Include the router
 app.include_router(api_router)
 
+# An exhausted connection pool is a transient overload, not a server error
+@app.exception_handler(WaitQueueTimeoutError)
+async def pool_timeout_handler(request, exc):
+    return JSONResponse({"detail": "Server busy, please retry"}, status_code=503, headers={"Retry-After": "1"})
+
+# Prometheus scrape target; outside /api so it is not exposed through the ingress prefix
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Inside the metrics middleware so it reuses the matched route and its 503s are counted
+app.add_middleware(AdmissionMiddleware, controller=admission, fastapi_app=app, class_of=request_class_name)
+app.add_middleware(metrics.MetricsMiddleware, fastapi_app=app)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+logger = logging.getLogger(__name__)
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""Slow Mongo command log with normalized query shapes.
+
+``SlowQueryLog`` is registered on the Motor client as a command listener.
+Any command slower than ``SLOW_QUERY_MS`` is queued together with the
+route that issued it, and a background task logs it under its normalized
+shape: filters, sorts and pipelines with every literal replaced by "?".
+The first slow occurrence of each read shape in a summary interval is
+re-run through ``explain`` so the log line shows documents examined
+against documents returned. Every ``SLOW_QUERY_SUMMARY_INTERVAL`` seconds
+the top ``SLOW_QUERY_TOP_N`` shapes by total time are logged and the
+counters reset.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+from metrics import current_route
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_SUMMARY_INTERVAL = float(os.environ.get('SLOW_QUERY_SUMMARY_INTERVAL', 300))
+SLOW_QUERY_TOP_N = int(os.environ.get('SLOW_QUERY_TOP_N', 10))
+SLOW_QUERY_MAX_PENDING = 1000
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+# Where each command keeps the parts that make up its shape
+SHAPE_FIELDS = {
+    "find": ("filter", "sort"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort", "update"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+STRUCTURAL_KEYS = {"sort", "key", "$sort", "$project", "$group", "$unset"}
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(value, structural: bool = False):
+    """Replace literals with "?" keeping operators, field names and sort directions."""
+    if isinstance(value, dict):
+        return {k: normalize(v, structural or k in STRUCTURAL_KEYS) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [normalize(v, structural) for v in value]
+        if not any(isinstance(v, (dict, list)) for v in items):
+            return "?" if not structural else items
+        unique = []
+        for item in items:
+            if item not in unique:
+                unique.append(item)
+        return unique
+    if structural and isinstance(value, (str, int)):
+        return value
+    return "?"
+
+
+def query_shape(command_name: str, command) -> str:
+    shape = {}
+    for field in SHAPE_FIELDS.get(command_name, ()):
+        if field in command:
+            value = command[field]
+            if field in ("updates", "deletes"):
+                value = [{"q": op.get("q"), "multi": op.get("multi", False)} for op in value]
+            shape[field] = normalize(value, field in STRUCTURAL_KEYS)
+    return json.dumps(shape, sort_keys=True, default=str)
+
+
+def _execution_stats(explain):
+    """Find executionStats anywhere in an explain reply (aggregate nests it per stage)."""
+    if isinstance(explain, dict):
+        if "executionStats" in explain:
+            return explain["executionStats"]
+        for value in explain.values():
+            found = _execution_stats(value)
+            if found:
+                return found
+    elif isinstance(explain, list):
+        for item in explain:
+            found = _execution_stats(item)
+            if found:
+                return found
+    return None
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, summary_interval: float = SLOW_QUERY_SUMMARY_INTERVAL,
+                 top_n: int = SLOW_QUERY_TOP_N, explain: bool = SLOW_QUERY_EXPLAIN):
+        self.threshold_ms = threshold_ms
+        self.summary_interval = summary_interval
+        self.top_n = top_n
+        self.explain = explain
+        self._started = {}
+        self._slow = deque(maxlen=SLOW_QUERY_MAX_PENDING)
+        self._shapes = {}
+        self._explained = set()
+        self.last_interval = []
+        self._db = None
+        self._task = None
+        self.slow_commands = 0
+
+    # Listener callbacks run on the driver's threads; they only touch the deque and dicts
+
+    def started(self, event):
+        if event.command_name in SHAPE_FIELDS:
+            route = current_route.get() or "background"
+            self._started[(event.connection_id, event.request_id)] = (event.command, route)
+
+    def succeeded(self, event):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is not None and event.duration_micros >= self.threshold_ms * 1000:
+            self._slow.append((event.command_name, started[0], started[1], event.duration_micros / 1000, event.reply))
+
+    def failed(self, event):
+        self._started.pop((event.connection_id, event.request_id), None)
+
+    async def _explain(self, command_name: str, command) -> dict:
+        body = {k: v for k, v in command.items() if not k.startswith('$') and k not in ('lsid', 'txnNumber')}
+        if command_name == "find":
+            body.pop("batchSize", None)
+        reply = await self._db.command({"explain": body, "verbosity": "executionStats"})
+        stats = _execution_stats(reply) or {}
+        return {"docs_examined": stats.get("totalDocsExamined"), "keys_examined": stats.get("totalKeysExamined")}
+
+    async def drain(self):
+        while self._slow:
+            command_name, command, route, took_ms, reply = self._slow.popleft()
+            self.slow_commands += 1
+            collection = command.get(command_name)
+            shape = query_shape(command_name, command)
+            key = (collection, command_name, shape)
+            cursor = reply.get("cursor", {})
+            returned = len(cursor.get("firstBatch", ())) if cursor else reply.get("n")
+
+            entry = self._shapes.setdefault(key, {
+                "collection": collection, "command": command_name, "shape": shape,
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "routes": set(),
+                "docs_examined": None, "docs_returned": None,
+            })
+            entry["count"] += 1
+            entry["total_ms"] += took_ms
+            entry["max_ms"] = max(entry["max_ms"], took_ms)
+            entry["routes"].add(route)
+            entry["docs_returned"] = returned
+
+            examined = ""
+            if self.explain and command_name in EXPLAINABLE and key not in self._explained:
+                self._explained.add(key)
+                try:
+                    plan = await self._explain(command_name, command)
+                    entry["docs_examined"] = plan["docs_examined"]
+                    examined = f" examined={plan['docs_examined']} keys={plan['keys_examined']}"
+                except Exception as e:
+                    logger.warning("Explain of slow %s on %s failed: %s", command_name, collection, e)
+
+            logger.warning("Slow %s on %s: %.1f ms route=%s returned=%s%s shape=%s",
+                           command_name, collection, took_ms, route, returned, examined, shape)
+
+    def top(self, n: int = None) -> list:
+        ranked = sorted(self._shapes.values(), key=lambda e: e["total_ms"], reverse=True)[:n or self.top_n]
+        return [{**e, "total_ms": round(e["total_ms"], 1), "max_ms": round(e["max_ms"], 1),
+                 "routes": sorted(e["routes"])} for e in ranked]
+
+    def summarize(self):
+        ranked = self.last_interval = self.top()
+        if ranked:
+            logger.warning("Top %d slow query shapes over the last %.0fs:", len(ranked), self.summary_interval)
+            for e in ranked:
+                logger.warning("  %8.1f ms total, %4d x, max %.1f ms  %s on %s routes=%s examined=%s shape=%s",
+                               e["total_ms"], e["count"], e["max_ms"], e["command"], e["collection"],
+                               ",".join(e["routes"]), e["docs_examined"], e["shape"])
+        self._shapes = {}
+        self._explained = set()
+
+    async def _run(self):
+        last_summary = time.monotonic()
+        while True:
+            await asyncio.sleep(1.0)
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Slow query log drain failed")
+            if time.monotonic() - last_summary >= self.summary_interval:
+                self.summarize()
+                last_summary = time.monotonic()
+
+    def start(self, db):
+        self._db = db
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "slow_commands": self.slow_commands,
+            "pending": len(self._slow),
+            "current_interval": self.top(),
+            "last_interval": self.last_interval,
+        }
@@ -0,0 +1,138 @@
+"""Materialized dashboard counters.
+
+The write paths keep one global document and one document per student in
+the ``stats`` collection up to date with atomic ``$inc`` upserts, so each
+dashboard is a single document read. ``reconcile`` rebuilds everything from
+the source collections; run it with ``python stats.py --reconcile``.
+"""
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_ID = "global"
+GLOBAL_FIELDS = ("total_exams", "total_subjects", "total_students", "total_submissions")
+
+
+def student_stats_id(student_id: str) -> str:
+    return f"student:{student_id}"
+
+
+def percentage(score, total_points) -> float:
+    if not total_points:
+        return 0.0
+    return score / total_points * 100
+
+
+async def bump(db, **increments):
+    await db.stats.update_one({"_id": GLOBAL_ID}, {"$inc": increments}, upsert=True)
+
+
+async def bump_student(db, student_id: str, **increments):
+    await db.stats.update_one({"_id": student_stats_id(student_id)}, {"$inc": increments}, upsert=True)
+
+
+async def bump_students(db, increments_by_student: dict):
+    """Apply many per-student increments in one bulk_write."""
+    updates = [
+        UpdateOne({"_id": student_stats_id(student_id)}, {"$inc": increments}, upsert=True)
+        for student_id, increments in increments_by_student.items()
+        if increments
+    ]
+    if updates:
+        await db.stats.bulk_write(updates, ordered=False)
+
+
+async def read_admin_stats(db) -> dict:
+    doc = await db.stats.find_one({"_id": GLOBAL_ID}) or {}
+    return {field: doc.get(field, 0) for field in GLOBAL_FIELDS}
+
+
+async def read_student_stats(db, student_id: str) -> dict:
+    doc = await db.stats.find_one({"_id": student_stats_id(student_id)}) or {}
+    graded = doc.get('graded_count', 0)
+    avg_score = doc.get('percentage_sum', 0) / graded if graded else 0
+    return {
+        "completed_exams": doc.get('completed', 0),
+        "in_progress": doc.get('in_progress', 0),
+        "average_score": round(avg_score, 2),
+    }
+
+
+async def reconcile(db) -> dict:
+    """Recompute every counter from scratch and replace the stats collection contents."""
+    totals = {
+        "total_exams": await db.exams.count_documents({}),
+        "total_subjects": await db.subjects.count_documents({}),
+        "total_students": await db.users.count_documents({"role": "student"}),
+        "total_submissions": await db.student_exams.count_documents({"status": {"$in": ["submitted", "graded"]}}),
+    }
+
+    pipeline = [
+        {"$group": {
+            "_id": "$student_id",
+            "completed": {"$sum": {"$cond": [{"$in": ["$status", ["submitted", "graded"]]}, 1, 0]}},
+            "in_progress": {"$sum": {"$cond": [{"$eq": ["$status", "in_progress"]}, 1, 0]}},
+            "graded_count": {"$sum": {"$cond": [
+                {"$and": [{"$eq": ["$status", "graded"]}, {"$isNumber": "$score"}]}, 1, 0
+            ]}},
+            "percentage_sum": {"$sum": {"$cond": [
+                {"$and": [
+                    {"$eq": ["$status", "graded"]},
+                    {"$isNumber": "$score"},
+                    {"$gt": ["$total_points", 0]},
+                ]},
+                {"$multiply": [{"$divide": ["$score", "$total_points"]}, 100]},
+                0
+            ]}},
+        }}
+    ]
+    students = 0
+    updates = []
+    await db.stats.delete_many({"_id": {"$regex": "^student:"}})
+    async for row in db.student_exams.aggregate(pipeline):
+        student_id = row.pop('_id')
+        updates.append(UpdateOne({"_id": student_stats_id(student_id)}, {"$set": row}, upsert=True))
+        if len(updates) >= 1000:
+            await db.stats.bulk_write(updates, ordered=False)
+            students += len(updates)
+            updates = []
+    if updates:
+        await db.stats.bulk_write(updates, ordered=False)
+        students += len(updates)
+
+    await db.stats.replace_one({"_id": GLOBAL_ID}, totals, upsert=True)
+    logger.info("Stats reconciled: %s, %d students", totals, students)
+    return {**totals, "students": students}
+
+
+async def ensure_stats(db):
+    """Build the counters on first start against a database that predates them."""
+    if not await db.stats.find_one({"_id": GLOBAL_ID}, {"_id": 1}):
+        await reconcile(db)
+
+
+async def _main() -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        print(await reconcile(client[os.environ['DB_NAME']]))
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if '--reconcile' not in sys.argv:
+        print("Usage: python stats.py --reconcile")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main()))
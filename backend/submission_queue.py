@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+import time
+
+SUBMIT_WORKERS = int(os.environ.get('SUBMIT_WORKERS', 4))
+SUBMIT_QUEUE_SIZE = int(os.environ.get('SUBMIT_QUEUE_SIZE', 5000))
+SUBMIT_SWEEP_INTERVAL = float(os.environ.get('SUBMIT_SWEEP_INTERVAL', 10.0))
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionQueue:
+    """Bounded queue of durably recorded submissions awaiting grading.
+
+    Intake writes the raw answers with status "submitted" before anything is
+    queued, so the queue itself holds only ids and may drop them: when it is
+    full the id is left for the sweeper, which periodically re-queues every
+    "submitted" attempt from Mongo. The same sweep recovers attempts that
+    were queued when a worker process died.
+    """
+
+    def __init__(self, workers: int = SUBMIT_WORKERS, max_size: int = SUBMIT_QUEUE_SIZE,
+                 sweep_interval: float = SUBMIT_SWEEP_INTERVAL):
+        self.workers = workers
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._queue = None
+        self._queued = set()
+        self._tasks = []
+        self._db = None
+        self._handler = None
+        self.enqueued = 0
+        self.overflowed = 0
+        self.swept = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def enqueue(self, submission_id: str) -> bool:
+        """Queue an id for grading; False means it was left for the sweeper."""
+        if submission_id in self._queued:
+            return True
+        try:
+            self._queue.put_nowait((submission_id, time.monotonic()))
+        except asyncio.QueueFull:
+            self.overflowed += 1
+            return False
+        self._queued.add(submission_id)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    async def _worker(self):
+        while True:
+            submission_id, queued_at = await self._queue.get()
+            wait = time.monotonic() - queued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                await self._handler(submission_id)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Grading submission %s failed; the sweeper will retry it", submission_id)
+            finally:
+                self._queued.discard(submission_id)
+                self._queue.task_done()
+
+    async def sweep(self):
+        """Queue every attempt still waiting in the "submitted" state."""
+        room = self.max_size - self._queue.qsize()
+        if room <= 0:
+            return
+        # Skip what is already queued so stranded attempts behind them are reached, oldest first
+        query = {"status": "submitted"}
+        if self._queued:
+            query["id"] = {"$nin": list(self._queued)}
+        cursor = self._db.student_exams.find(query, {"_id": 0, "id": 1}) \
+            .sort("submitted_at", 1).limit(room)
+        async for doc in cursor:
+            if doc['id'] not in self._queued and self.enqueue(doc['id']):
+                self.swept += 1
+
+    async def _sweeper(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Submission sweep failed")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self, db, handler):
+        """Start the workers; ``await handler(submission_id)`` grades one attempt."""
+        self._db = db
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        dequeued = self.processed + self.failed
+        return {
+            "workers": self.workers,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "overflowed": self.overflowed,
+            "swept": self.swept,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / dequeued * 1000, 1) if dequeued else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
@@ -1,5 +1,9 @@
+import json
 import requests
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 class ExamAPITester:
@@ -318,6 +322,31 @@ class ExamAPITester:
         )
         return success
 
+    def test_exam_bundle_etag(self):
+        """Test that the exam bundle is revalidated with its ETag"""
+        if not self.exam_id:
+            print("⚠️ Skipping exam bundle - no exam ID")
+            return False
+        
+        print("\n🔍 Testing Exam Bundle ETag...")
+        url = f"{self.api}/exams/{self.exam_id}/bundle"
+        headers = {'Authorization': f'Bearer {self.student_token}'}
+        try:
+            response = requests.get(url, headers=headers, timeout=10)
+            etag = response.headers.get('ETag')
+            bundle = response.json() if response.status_code == 200 else {}
+            if response.status_code != 200 or not etag or len(bundle.get('questions', [])) != len(self.question_ids):
+                return self.log_test("Exam Bundle ETag", False, "Bundle incomplete", response.status_code)
+            if any(q.get('correct_answer') for q in bundle['questions']):
+                return self.log_test("Exam Bundle ETag", False, "Bundle exposes answers", response.status_code)
+            
+            revalidated = requests.get(url, headers={**headers, 'If-None-Match': etag}, timeout=10)
+        except Exception as e:
+            return self.log_test("Exam Bundle ETag", False, str(e))
+        
+        success = revalidated.status_code == 304 and not revalidated.content
+        return self.log_test("Exam Bundle ETag", success, "Expected 304 on matching ETag", revalidated.status_code)
+
     def test_start_exam(self):
         """Test starting an exam as student"""
         if not self.exam_id:
@@ -361,6 +390,50 @@ class ExamAPITester:
         )
         return success
 
+    def test_concurrent_start_submit(self):
+        """Test that racing start/submit requests create and grade exactly one attempt"""
+        if not self.subject_id:
+            print("⚠️ Skipping concurrency test - no subject ID")
+            return False
+        
+        success, exam = self.run_test(
+            "Create Exam For Concurrency Test",
+            "POST",
+            "exams",
+            200,
+            data={"title": "Ujian Serentak", "subject_id": self.subject_id, "class_name": "4A"},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        
+        print("\n🔍 Testing Concurrent Start/Submit...")
+        url = f"{self.api}/exams/{exam['id']}"
+        headers = {'Authorization': f'Bearer {self.student_token}'}
+        
+        def hammer(path, data=None, times=20):
+            def post(_):
+                return requests.post(f"{url}/{path}", json=data, headers=headers, timeout=30).status_code
+            with ThreadPoolExecutor(max_workers=times) as pool:
+                return Counter(pool.map(post, range(times)))
+        
+        starts = hammer("start")
+        submits = hammer("submit", {"answers": []})
+        attempts = requests.get(
+            f"{self.api}/exams/history", params={"exam_id": exam['id']},
+            headers={'Authorization': f'Bearer {self.admin_token}'}, timeout=10
+        ).json()
+        
+        success = (
+            starts[200] == 1 and starts[400] == 19 and
+            submits[200] == 1 and submits[404] == 19 and
+            len(attempts) == 1 and attempts[0]['status'] == 'graded'
+        )
+        return self.log_test(
+            "Concurrent Start/Submit", success,
+            f"start={dict(starts)} submit={dict(submits)} attempts={len(attempts)}"
+        )
+
     def test_get_exam_history(self):
         """Test getting exam history"""
         success, response = self.run_test(
@@ -387,6 +460,85 @@ class ExamAPITester:
         )
         return success
 
+    def test_live_results_snapshot(self):
+        """Test that the live results stream opens with a snapshot of the exam's attempts"""
+        if not self.exam_id:
+            print("⚠️ Skipping live results - no exam ID")
+            return False
+        
+        print("\n🔍 Testing Live Results Snapshot...")
+        try:
+            with requests.get(f"{self.api}/exams/{self.exam_id}/live",
+                              headers={'Authorization': f'Bearer {self.admin_token}'},
+                              stream=True, timeout=10) as response:
+                if response.status_code != 200:
+                    return self.log_test("Live Results Snapshot", False, "Stream not opened", response.status_code)
+                lines = response.iter_lines(decode_unicode=True)
+                event = next(line for line in lines if line.startswith("event:"))
+                data = next(lines)
+        except Exception as e:
+            return self.log_test("Live Results Snapshot", False, str(e))
+        
+        snapshot = json.loads(data[len("data:"):]) if data.startswith("data:") else {}
+        success = event == "event: snapshot" and len(snapshot.get('attempts', [])) >= 1
+        return self.log_test("Live Results Snapshot", success, f"Got {event!r}", 200)
+
+    def test_live_results_token(self):
+        """Test that the live results stream opens with a scoped token in the URL"""
+        if not self.exam_id:
+            print("⚠️ Skipping live results token - no exam ID")
+            return False
+        
+        success, response = self.run_test(
+            "Issue Live Results Token",
+            "POST",
+            f"exams/{self.exam_id}/live/token",
+            200,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        
+        print("\n🔍 Testing Live Results Token...")
+        try:
+            with requests.get(f"{self.api}/exams/{self.exam_id}/live", params={"token": response['token']},
+                              stream=True, timeout=10) as stream:
+                opened = stream.status_code == 200
+            # The scoped token must not work as a regular bearer token
+            rejected = requests.get(f"{self.api}/exams/history",
+                                    headers={'Authorization': f"Bearer {response['token']}"},
+                                    timeout=10).status_code == 401
+        except Exception as e:
+            return self.log_test("Live Results Token", False, str(e))
+        
+        return self.log_test("Live Results Token", opened and rejected, f"opened={opened} rejected={rejected}")
+
+    def test_regrade_exam(self):
+        """Test re-grading all submissions of an exam"""
+        if not self.exam_id:
+            print("⚠️ Skipping re-grade - no exam ID")
+            return False
+        
+        success, response = self.run_test(
+            "Re-grade Exam (Admin)",
+            "POST",
+            f"exams/{self.exam_id}/regrade",
+            202,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        
+        # The re-grade runs in the background; poll its job until it settles
+        job = {}
+        for _ in range(20):
+            job = requests.get(f"{self.api}/regrade-jobs/{response['job_id']}",
+                               headers={'Authorization': f'Bearer {self.admin_token}'}, timeout=10).json()
+            if job.get('status') != 'running':
+                break
+            time.sleep(0.5)
+        return self.log_test("Re-grade Job Completed", job.get('status') == 'completed', f"status={job.get('status')}")
+
     def test_admin_dashboard(self):
         """Test admin dashboard"""
         success, response = self.run_test(
@@ -443,12 +595,14 @@ class ExamAPITester:
         self.test_create_multiple_choice_question()
         self.test_create_essay_question()
         self.test_get_questions()
+        self.test_exam_bundle_etag()
         
         # Student exam flow tests
         print("\n🎓 STUDENT EXAM FLOW TESTS")
         print("-" * 60)
         self.test_start_exam()
         self.test_submit_exam()
+        self.test_concurrent_start_submit()
         self.test_get_exam_history()
         
         # Dashboard tests
@@ -461,6 +615,9 @@ class ExamAPITester:
         print("\n📈 RESULTS TESTS")
         print("-" * 60)
         self.test_get_exam_results()
+        self.test_live_results_snapshot()
+        self.test_live_results_token()
+        self.test_regrade_exam()
         
         # Print summary
         print("\n" + "=" * 60)
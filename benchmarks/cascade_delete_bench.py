@@ -0,0 +1,211 @@
+"""Cascade delete under live load.
+
+Seeds an exam with attempts next to a live exam, then runs students
+against the live exam (fetch questions, autosave, list exams) twice: once
+undisturbed for --duration seconds, and once from DELETE /exams/{id} until
+the background job has deleted every attempt. Reports the students' p50,
+p95, p99 and requests per second in both phases, the DELETE request's own
+latency and how long the job took. Fails if the job did not remove every
+attempt or did not take exactly their submissions off the dashboard
+counters.
+
+Runs in-process like exam_day_sim.py: mongomock-motor by default, or a
+throwaway database with --mongo-url. mongomock scans collections on the
+event loop itself, so its delete batches stall students outright and its
+latencies say nothing about production; the default run seeds 2,000
+attempts and only checks correctness. With --mongo-url it seeds 50,000
+and also fails if the students' p99 rose or their throughput fell by
+more than the tolerance.
+
+Usage:
+    python benchmarks/cascade_delete_bench.py [--attempts N] [--students 50]
+        [--duration 5] [--mongo-url URL] [--tolerance 0.5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from exam_day_sim import P95_NOISE_MS, ExamDaySimulation  # noqa: E402
+from login_storm import percentile  # noqa: E402
+
+
+class CascadeDeleteBenchmark(ExamDaySimulation):
+    def __init__(self, attempts=50000, students=50, duration=5.0, mongo_url=None):
+        super().__init__(students=students, questions=20, mongo_url=mongo_url)
+        self.attempts = attempts
+        self.duration = duration
+        self.elapsed = {}
+
+    async def create_exam(self, client, token, subject_id, title):
+        exam = (await self.call(client, "setup", "POST", "/api/exams", token, json={
+            "title": title, "subject_id": subject_id, "class_name": "SIM"
+        })).json()
+        for i in range(self.questions):
+            await self.call(client, "setup", "POST", f"/api/exams/{exam['id']}/questions", token, json={
+                "question_text": f"Soal {i + 1}", "question_type": "multiple_choice",
+                "options": ["A", "B", "C", "D"], "correct_answer": str(i % 4), "order": i
+            })
+        return exam['id']
+
+    async def seed(self, client):
+        server = self.server
+        admin = (await self.call(client, "setup", "POST", "/api/auth/register", json={
+            "name": "Proktor", "email": "proktor.cascade@test.com", "password": "admin123", "role": "admin"
+        })).json()
+        self.admin_token = admin['token']
+        subject = (await self.call(client, "setup", "POST", "/api/subjects", self.admin_token,
+                                   json={"name": "IPA"})).json()
+        self.doomed_exam = await self.create_exam(client, self.admin_token, subject['id'], "Ujian Lama")
+        self.live_exam = await self.create_exam(client, self.admin_token, subject['id'], "Ujian Hari Ini")
+
+        print(f"Seeding {self.attempts} attempts...")
+        now = datetime.now(timezone.utc)
+        batch = []
+        for i in range(self.attempts):
+            batch.append({
+                "id": str(uuid.uuid4()), "exam_id": self.doomed_exam, "student_id": f"alumni-{i}",
+                "student_name": f"Alumni {i}", "class_name": "LAMA", "exam_title": "Ujian Lama",
+                "subject_name": "IPA", "answers": [], "score": float(i % 100), "total_points": 100,
+                "started_at": now, "submitted_at": now, "status": "graded",
+            })
+            if len(batch) == 5000:
+                await server.db.student_exams.insert_many(batch)
+                batch = []
+        if batch:
+            await server.db.student_exams.insert_many(batch)
+        await server.stats.reconcile(server.db)
+
+        # Live students get tokens directly; login cost is exam_day_sim's concern
+        self.tokens = []
+        for i in range(self.students):
+            student_id = str(uuid.uuid4())
+            await server.db.users.insert_one({
+                "id": student_id, "email": f"cascade{i}@test.com", "name": f"Siswa {i}", "role": "student",
+                "class_name": "SIM", "created_at": now, "password_hash": "",
+            })
+            token = server.create_token(student_id, f"cascade{i}@test.com", "student", f"Siswa {i}", "SIM")
+            await self.call(client, "setup", "POST", f"/api/exams/{self.live_exam}/start", token)
+            self.tokens.append(token)
+
+    async def student_load(self, client, token, phase, done):
+        n = 0
+        while not done.is_set():
+            questions = (await self.call(client, phase, "GET", f"/api/exams/{self.live_exam}/questions", token)).json()
+            q = questions[n % len(questions)]
+            await self.call(client, phase, "PATCH", f"/api/exams/{self.live_exam}/answers", token,
+                            json={"answers": [{"question_id": q['id'], "answer_text": str(n % 4)}]})
+            await self.call(client, phase, "GET", "/api/exams", token)
+            n += 1
+            await asyncio.sleep(0.01)
+
+    async def baseline(self, client):
+        started = time.perf_counter()
+        done = asyncio.Event()
+        students = [asyncio.create_task(self.student_load(client, token, "baseline", done)) for token in self.tokens]
+        await asyncio.sleep(self.duration)
+        done.set()
+        await asyncio.gather(*students)
+        self.elapsed["baseline"] = time.perf_counter() - started
+
+    async def during_delete(self, client):
+        started = time.perf_counter()
+        done = asyncio.Event()
+        students = [asyncio.create_task(self.student_load(client, token, "during_delete", done))
+                    for token in self.tokens]
+        before = await self.server.stats.read_admin_stats(self.server.db)
+        response = await self.call(client, "delete", "DELETE", f"/api/exams/{self.doomed_exam}", self.admin_token)
+        job_id = response.json()['job_id']
+        while True:
+            job = (await self.call(client, "poll", "GET", f"/api/delete-jobs/{job_id}", self.admin_token)).json()
+            if job['status'] != "running":
+                break
+            await asyncio.sleep(0.2)
+        self.job = job
+        self.job_seconds = time.perf_counter() - started
+        after = await self.server.stats.read_admin_stats(self.server.db)
+        self.submissions_removed = before['total_submissions'] - after['total_submissions']
+        done.set()
+        await asyncio.gather(*students)
+        self.elapsed["during_delete"] = time.perf_counter() - started
+
+    async def run(self):
+        import httpx
+
+        self.load_app()
+        app = self.server.app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://sim", timeout=None) as client:
+                await self.seed(client)
+                print(f"Baseline: {self.students} students for {self.duration}s...")
+                await self.baseline(client)
+                print("Deleting the seeded exam under the same load...")
+                await self.during_delete(client)
+                self.remaining = await self.server.db.student_exams.count_documents({"exam_id": self.doomed_exam})
+
+    def latencies(self, phase):
+        return [(end - start) * 1000 for start, end in self.samples[phase]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade delete under live student load")
+    parser.add_argument('--attempts', type=int, help="default 50000 with --mongo-url, else 2000")
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--mongo-url')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="allowed relative p99 growth and throughput loss")
+    args = parser.parse_args()
+    if args.attempts is None:
+        args.attempts = 50000 if args.mongo_url else 2000
+
+    bench = CascadeDeleteBenchmark(args.attempts, args.students, args.duration, args.mongo_url)
+    asyncio.run(bench.run())
+
+    print("=" * 70)
+    print(f"🗑️  Cascade delete of {args.attempts} attempts under {args.students} live students")
+    print("=" * 70)
+    p99, rate = {}, {}
+    for phase in ("baseline", "during_delete"):
+        latencies = bench.latencies(phase)
+        p99[phase] = percentile(latencies, 99)
+        rate[phase] = len(latencies) / bench.elapsed[phase]
+        print(f"{phase:<14} {len(latencies):>6} reqs  {rate[phase]:7.1f} req/s  p50={percentile(latencies, 50):7.1f}ms  "
+              f"p95={percentile(latencies, 95):7.1f}ms  p99={p99[phase]:7.1f}ms")
+    print(f"DELETE /exams/{{id}} responded in {bench.latencies('delete')[0]:.1f} ms")
+    print(f"Job {bench.job['status']} in {bench.job_seconds:.1f}s, deleted {bench.job['deleted']}, "
+          f"{bench.remaining} attempts left")
+
+    failures = []
+    if bench.job['status'] != "completed" or bench.remaining:
+        failures.append(f"job {bench.job['status']} with {bench.remaining} attempts left")
+    if bench.submissions_removed != args.attempts:
+        failures.append(f"total_submissions fell by {bench.submissions_removed}, expected {args.attempts}")
+    allowed = max(p99['baseline'] * (1 + args.tolerance), p99['baseline'] + P95_NOISE_MS)
+    floor = rate['baseline'] / (1 + args.tolerance)
+    slowdowns = []
+    if p99['during_delete'] > allowed:
+        slowdowns.append(f"p99 {p99['during_delete']:.1f} ms > {allowed:.1f} ms")
+    if rate['during_delete'] < floor:
+        slowdowns.append(f"throughput {rate['during_delete']:.1f} req/s < {floor:.1f} req/s")
+    if args.mongo_url:
+        failures += slowdowns
+    else:
+        for slowdown in slowdowns:
+            print(f"⚠️  {slowdown} (mongomock runs deletes on the event loop; not asserted)")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Every attempt and its counters were removed" if not args.mongo_url
+              else "✅ Students were unaffected by the delete")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
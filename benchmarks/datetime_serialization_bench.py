@@ -0,0 +1,102 @@
+"""Timestamp storage serialization benchmark.
+
+Times the read side of a 1,000-row GET /exams/history response with
+timestamps stored as ISO strings (decoded, converted with the old
+per-document ``datetime.fromisoformat`` loop, validated and serialized) and
+with native BSON datetimes (decoded, validated and serialized directly).
+BSON decoding goes through the driver's codec with ``tz_aware`` as the app's
+client uses it, so both sides include what Motor does per document.
+
+Usage:
+    python benchmarks/datetime_serialization_bench.py [rows]
+"""
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark')
+
+import bson  # noqa: E402
+from bson.codec_options import CodecOptions  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from server import StudentExam  # noqa: E402
+
+CODEC = CodecOptions(tz_aware=True)
+
+
+def make_rows(count):
+    base = datetime(2026, 5, 4, 7, 30, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        started = base + timedelta(seconds=i * 7)
+        rows.append({
+            "id": str(uuid.uuid4()), "exam_id": str(uuid.uuid4()), "student_id": str(uuid.uuid4()),
+            "student_name": f"Siswa {i}", "class_name": "IX-A", "exam_title": "Ujian Tengah Semester",
+            "subject_name": "Matematika",
+            "answers": [{"question_id": str(uuid.uuid4()), "answer_text": str(n % 4)} for n in range(20)],
+            "score": float(i % 100), "total_points": 100,
+            "started_at": started, "submitted_at": started + timedelta(minutes=45), "status": "graded",
+        })
+    return rows
+
+
+def as_iso_strings(rows):
+    return [{**r, "started_at": r["started_at"].isoformat(), "submitted_at": r["submitted_at"].isoformat()}
+            for r in rows]
+
+
+def legacy(raw, adapter):
+    exams = [bson.decode(doc, CODEC) for doc in raw]
+    for e in exams:
+        if isinstance(e.get('started_at'), str):
+            e['started_at'] = datetime.fromisoformat(e['started_at'])
+        if isinstance(e.get('submitted_at'), str):
+            e['submitted_at'] = datetime.fromisoformat(e['submitted_at'])
+    return adapter.dump_json(adapter.validate_python(exams))
+
+
+def native(raw, adapter):
+    exams = [bson.decode(doc, CODEC) for doc in raw]
+    return adapter.dump_json(adapter.validate_python(exams))
+
+
+def best_of(fn, raw, adapter, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(raw, adapter)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rows = make_rows(count)
+    adapter = TypeAdapter(List[StudentExam])
+    raw_strings = [bson.encode(r) for r in as_iso_strings(rows)]
+    raw_native = [bson.encode(r) for r in rows]
+
+    before = best_of(legacy, raw_strings, adapter)
+    after = best_of(native, raw_native, adapter)
+    same = legacy(raw_strings, adapter) == native(raw_native, adapter)
+
+    print("=" * 60)
+    print(f"🕒 Timestamp serialization: {count}-row history response (best of 20)")
+    print("=" * 60)
+    print(f"ISO strings + fromisoformat loop: {before * 1000:8.2f} ms")
+    print(f"BSON datetimes:                   {after * 1000:8.2f} ms")
+    print(f"Speed-up: {before / after:.2f}x, identical JSON: {same}")
+    print(f"Stored bytes per row: {sum(map(len, raw_strings)) / count:.0f} (strings) vs "
+          f"{sum(map(len, raw_native)) / count:.0f} (datetimes)")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
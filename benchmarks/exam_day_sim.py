@@ -0,0 +1,307 @@
+"""Exam-day load simulation, run in-process.
+
+Starts the FastAPI app (lifespan included) inside this process, backed by
+mongomock-motor or, with --mongo-url, a throwaway database on a real
+server, and drives it through httpx's ASGI transport. N students log in,
+list their exams, start, fetch questions, autosave a few times with some
+think time, then all submit together in one burst.
+
+The report covers each endpoint: request count, non-2xx responses,
+throughput, p50/p95/p99 latency, and Mongo operations per request. Ops are
+counted by wrapping every collection the app touches; ops issued outside a
+request (autosave flushes, queue workers) are reported as "background".
+With mongomock every operation runs on the event loop, so latencies say
+more about relative cost than about a production deployment. Op counts are
+exact either way. --output saves the report as JSON. --baseline compares
+against a report saved with the same settings and exits 1 when an
+endpoint's p95 grows past the tolerance (and by more than 5 ms), or when it
+issues more Mongo ops per request or fails more requests than before.
+
+Install the simulation's extra dependencies with
+``pip install -r benchmarks/requirements.txt``.
+
+Usage:
+    python benchmarks/exam_day_sim.py [--students 300] [--questions 40]
+        [--autosaves 3] [--think 0.05] [--mongo-url URL]
+        [--output report.json] [--baseline report.json] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from login_storm import percentile  # noqa: E402
+
+COUNTED_OPERATIONS = {
+    "find", "find_one", "find_one_and_update", "find_one_and_delete", "insert_one", "insert_many",
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many", "bulk_write",
+    "aggregate", "count_documents", "estimated_document_count", "distinct", "create_indexes",
+}
+
+P95_NOISE_MS = 5.0
+
+current_endpoint = contextvars.ContextVar('current_endpoint', default="background")
+
+
+class CountingCollection:
+    """Collection proxy that tallies each operation under the current endpoint."""
+
+    def __init__(self, collection, counts: Counter):
+        self._collection = collection
+        self._counts = counts
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in COUNTED_OPERATIONS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counts[current_endpoint.get()] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+        self._collections = {}
+        self.counts = Counter()
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = CountingCollection(self._database[name], self.counts)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            return getattr(self._database, name)
+        return self[name]
+
+
+class ExamDaySimulation:
+    def __init__(self, students=300, questions=40, autosaves=3, think=0.05, mongo_url=None):
+        self.students = students
+        self.questions = questions
+        self.autosaves = autosaves
+        self.think = think
+        self.mongo_url = mongo_url
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.server = None
+        self.database = None
+
+    def load_app(self):
+        os.environ.setdefault('MONGO_URL', self.mongo_url or 'mongodb://localhost:27017')
+        os.environ['DB_NAME'] = f"exam_day_sim_{uuid.uuid4().hex[:8]}"
+        if not self.mongo_url:
+            import motor.motor_asyncio
+            from mongomock_motor import AsyncMongoMockClient
+
+            class MockClient(AsyncMongoMockClient):
+                def __init__(self, *args, **kwargs):
+                    super().__init__()
+
+            motor.motor_asyncio.AsyncIOMotorClient = MockClient
+
+        import server
+        self.server = server
+        connect = server.connect
+
+        # The lifespan opens the client; count from then on, background components included
+        def counting_connect():
+            connect()
+            self.database = server.db = CountingDatabase(server.db)
+
+        server.connect = counting_connect
+
+    async def call(self, client, endpoint, method, path, token=None, **kwargs):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        token_ = current_endpoint.set(endpoint)
+        try:
+            while True:
+                start = time.perf_counter()
+                response = await client.request(method, path, headers=headers, **kwargs)
+                self.samples[endpoint].append((start, time.perf_counter()))
+                self.statuses[endpoint][response.status_code] += 1
+                if response.status_code != 503:
+                    return response
+                await asyncio.sleep(float(response.headers.get('Retry-After', 1)))
+        finally:
+            current_endpoint.reset(token_)
+
+    async def setup(self, client):
+        import bcrypt
+
+        admin = (await self.call(client, "setup", "POST", "/api/auth/register", json={
+            "name": "Proktor", "email": "proktor.sim@test.com", "password": "admin123", "role": "admin"
+        })).json()
+        token = admin['token']
+        subject = (await self.call(client, "setup", "POST", "/api/subjects", token, json={"name": "Matematika"})).json()
+        exam = (await self.call(client, "setup", "POST", "/api/exams", token, json={
+            "title": "Ujian Akhir", "subject_id": subject['id'], "class_name": "SIM", "duration_minutes": 90
+        })).json()
+        for i in range(self.questions):
+            await self.call(client, "setup", "POST", f"/api/exams/{exam['id']}/questions", token, json={
+                "question_text": f"Soal {i + 1}", "question_type": "multiple_choice",
+                "options": ["A", "B", "C", "D"], "correct_answer": str(i % 4), "order": i
+            })
+
+        # Students are inserted directly with one shared hash; bcrypt cost still lands on login
+        password_hash = bcrypt.hashpw(b"siswa123", bcrypt.gensalt()).decode('utf-8')
+        now = datetime.now(timezone.utc)
+        await self.server.db.users.insert_many([{
+            "id": str(uuid.uuid4()), "email": f"sim{i}@test.com", "name": f"Siswa {i}", "role": "student",
+            "class_name": "SIM", "created_at": now, "password_hash": password_hash,
+        } for i in range(self.students)])
+
+    async def student(self, client, i, arrived, burst):
+        await asyncio.sleep(random.uniform(0, self.think * 10))
+        login = (await self.call(client, "POST /auth/login", "POST", "/api/auth/login", json={
+            "email": f"sim{i}@test.com", "password": "siswa123"
+        })).json()
+        token = login['token']
+
+        exams = (await self.call(client, "GET /exams", "GET", "/api/exams", token)).json()
+        exam_id = exams[0]['id']
+        await self.call(client, "POST /exams/{id}/start", "POST", f"/api/exams/{exam_id}/start", token)
+        questions = (await self.call(client, "GET /exams/{id}/questions", "GET",
+                                     f"/api/exams/{exam_id}/questions", token)).json()
+
+        answers = {}
+        per_save = max(1, len(questions) // max(1, self.autosaves))
+        for n in range(self.autosaves):
+            await asyncio.sleep(random.uniform(0, self.think))
+            batch = questions[n * per_save:(n + 1) * per_save]
+            delta = [{"question_id": q['id'], "answer_text": str(random.randrange(4))} for q in batch]
+            answers.update((a['question_id'], a['answer_text']) for a in delta)
+            await self.call(client, "PATCH /exams/{id}/answers", "PATCH", f"/api/exams/{exam_id}/answers",
+                            token, json={"answers": delta})
+
+        arrived.append(i)
+        if len(arrived) == self.students:
+            burst.set()
+        await burst.wait()
+        await self.call(client, "POST /exams/{id}/submit", "POST", f"/api/exams/{exam_id}/submit", token, json={
+            "answers": [{"question_id": qid, "answer_text": text} for qid, text in answers.items()]
+        })
+
+    async def run(self):
+        import httpx
+
+        self.load_app()
+        app = self.server.app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://sim", timeout=None) as client:
+                await self.setup(client)
+                arrived, burst = [], asyncio.Event()
+                started = time.perf_counter()
+                await asyncio.gather(*(self.student(client, i, arrived, burst) for i in range(self.students)))
+                elapsed = time.perf_counter() - started
+        if self.mongo_url:
+            await self.server.client.drop_database(os.environ['DB_NAME'])
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in self.samples.items():
+            if endpoint == "setup":
+                continue
+            latencies = [(end - start) * 1000 for start, end in samples]
+            window = max(end for _, end in samples) - min(start for start, _ in samples)
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": sum(n for code, n in statuses.items() if code >= 300),
+                "throughput_rps": round(len(samples) / window, 1) if window else None,
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "mongo_ops_per_request": round(self.database.counts[endpoint] / len(samples), 2),
+            }
+        return {
+            "students": self.students,
+            "questions": self.questions,
+            "autosaves": self.autosaves,
+            "backend": "mongodb" if self.mongo_url else "mongomock",
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": endpoints,
+            "background_mongo_ops": self.database.counts["background"],
+        }
+
+
+def print_report(report):
+    print("=" * 100)
+    print(f"🏫 Exam day: {report['students']} students x {report['questions']} questions, "
+          f"{report['autosaves']} autosaves each, {report['backend']} ({report['elapsed_s']}s)")
+    print("=" * 100)
+    print(f"{'endpoint':<28}{'reqs':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/req':>10}")
+    for endpoint, row in report['endpoints'].items():
+        print(f"{endpoint:<28}{row['requests']:>7}{row['errors']:>8}{row['throughput_rps'] or 0:>9.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['mongo_ops_per_request']:>10.2f}")
+    print(f"Background Mongo ops (autosave flushes, workers): {report['background_mongo_ops']}")
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for endpoint, row in report['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if not before:
+            continue
+        if row['p95_ms'] > max(before['p95_ms'] * (1 + tolerance), before['p95_ms'] + P95_NOISE_MS):
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']}ms -> {row['p95_ms']}ms")
+        if row['mongo_ops_per_request'] > before['mongo_ops_per_request']:
+            regressions.append(f"{endpoint}: Mongo ops/request {before['mongo_ops_per_request']} -> "
+                               f"{row['mongo_ops_per_request']}")
+        if row['errors'] > before['errors']:
+            regressions.append(f"{endpoint}: errors {before['errors']} -> {row['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process exam-day load simulation")
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--autosaves', type=int, default=3)
+    parser.add_argument('--think', type=float, default=0.05, help="max seconds between a student's autosaves")
+    parser.add_argument('--mongo-url', help="use a throwaway database on this server instead of mongomock")
+    parser.add_argument('--output', help="write the report as JSON")
+    parser.add_argument('--baseline', help="fail on regressions against a saved JSON report")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative p95 growth")
+    args = parser.parse_args()
+
+    random.seed(11)
+    report = asyncio.run(ExamDaySimulation(args.students, args.questions, args.autosaves,
+                                           args.think, args.mongo_url).run())
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        shape = ('students', 'questions', 'autosaves', 'backend')
+        if any(baseline[k] != report[k] for k in shape):
+            print(f"Baseline was run with {', '.join(f'{k}={baseline[k]}' for k in shape)}; rerun with the same settings")
+            return 2
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline")
+    return 0 if all(row['errors'] == 0 for row in report['endpoints'].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Fast JSON response benchmark for GET /exams/history.
+
+Measures CPU time to turn one 1,000-row page of history documents (as the
+driver returns them, with BSON datetimes) into a response: once through
+FastAPI's response_model path for the route (validate into StudentExam,
+serialize, json.dumps) and once through fast_json.list_response. Checks
+that both bodies are byte-for-byte identical.
+
+Usage:
+    python benchmarks/fast_json_bench.py [rows]
+"""
+import asyncio
+import copy
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from datetime_serialization_bench import make_rows  # noqa: E402  (sets MONGO_URL/DB_NAME defaults)
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import fast_json  # noqa: E402
+from server import StudentExam, app  # noqa: E402
+
+
+def history_route():
+    return next(r for r in app.routes if getattr(r, 'path', None) == "/api/exams/history")
+
+
+async def pydantic_path(route, docs):
+    content = await serialize_response(field=route.response_field, response_content=docs)
+    return JSONResponse(content).body
+
+
+async def fast_path(route, docs):
+    return fast_json.list_response(docs, StudentExam).body
+
+
+async def cpu_per_request(fn, route, rows, repeat=30):
+    pages = [copy.deepcopy(rows) for _ in range(repeat)]
+    start = time.process_time()
+    for docs in pages:
+        await fn(route, docs)
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    if fast_json.orjson is None:
+        print("orjson is not installed")
+        return 1
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    route = history_route()
+    rows = make_rows(count)
+    for row in rows[::2]:
+        row['score'] = int(row['score'])  # inline grading stores ints
+
+    before = asyncio.run(cpu_per_request(pydantic_path, route, rows))
+    after = asyncio.run(cpu_per_request(fast_path, route, rows))
+    same = asyncio.run(pydantic_path(route, copy.deepcopy(rows))) == \
+        asyncio.run(fast_path(route, copy.deepcopy(rows)))
+
+    print("=" * 60)
+    print(f"⚡ GET /exams/history serialization: {count} rows, CPU per request (avg of 30)")
+    print("=" * 60)
+    print(f"response_model (Pydantic + json): {before * 1000:8.2f} ms")
+    print(f"fast_json (orjson):               {after * 1000:8.2f} ms")
+    print(f"Speed-up: {before / after:.1f}x, identical bodies: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
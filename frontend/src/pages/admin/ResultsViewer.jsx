@@ -1,27 +1,63 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { toast } from 'sonner';
+import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Users, TrendingUp, Award } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Select items cannot have an empty value, so "all" stands for no filter
+const ALL = 'all';
+
 const ResultsViewer = () => {
   const [results, setResults] = useState([]);
+  const [exams, setExams] = useState([]);
+  const [filters, setFilters] = useState({ exam_id: ALL, class_name: '', status: ALL });
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
-    fetchResults();
+    fetchExams();
   }, []);
 
-  const fetchResults = async () => {
+  useEffect(() => {
+    fetchResults();
+  }, [filters.exam_id, filters.status]);
+
+  const fetchExams = async () => {
+    try {
+      const response = await axios.get(`${API}/exams`);
+      setExams(response.data);
+    } catch (error) {
+      toast.error('Gagal memuat daftar ujian');
+    }
+  };
+
+  const buildParams = (after) => {
+    const params = {};
+    if (filters.exam_id !== ALL) params.exam_id = filters.exam_id;
+    if (filters.class_name.trim()) params.class_name = filters.class_name.trim();
+    if (filters.status !== ALL) params.status = filters.status;
+    if (after) params.after = after;
+    return params;
+  };
+
+  // History is paged; one page per request, the next one only on "Muat lebih banyak"
+  const fetchResults = async (after = null) => {
+    if (after) setLoadingMore(true);
     try {
-      const response = await axios.get(`${API}/exams/history`);
-      setResults(response.data);
+      const response = await axios.get(`${API}/exams/history`, { params: buildParams(after) });
+      setResults(after ? (prev) => prev.concat(response.data) : response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       toast.error('Gagal memuat hasil ujian');
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -38,6 +74,40 @@ const ResultsViewer = () => {
     <div className="animate-fadeIn">
       <h1 className="text-4xl font-bold text-gray-800 mb-8" data-testid="results-title">Hasil Ujian</h1>
 
+      <div className="flex flex-wrap gap-4 mb-8" data-testid="results-filters">
+        <Select value={filters.exam_id} onValueChange={(value) => setFilters({ ...filters, exam_id: value })}>
+          <SelectTrigger className="w-64 bg-white" data-testid="results-exam-filter">
+            <SelectValue placeholder="Semua ujian" />
+          </SelectTrigger>
+          <SelectContent>
+            <SelectItem value={ALL}>Semua ujian</SelectItem>
+            {exams.map((exam) => (
+              <SelectItem key={exam.id} value={exam.id}>{exam.title}</SelectItem>
+            ))}
+          </SelectContent>
+        </Select>
+        <Select value={filters.status} onValueChange={(value) => setFilters({ ...filters, status: value })}>
+          <SelectTrigger className="w-48 bg-white" data-testid="results-status-filter">
+            <SelectValue placeholder="Semua status" />
+          </SelectTrigger>
+          <SelectContent>
+            <SelectItem value={ALL}>Semua status</SelectItem>
+            <SelectItem value="graded">Selesai</SelectItem>
+            <SelectItem value="submitted">Diperiksa</SelectItem>
+            <SelectItem value="in_progress">Sedang Dikerjakan</SelectItem>
+          </SelectContent>
+        </Select>
+        <Input
+          className="w-48 bg-white"
+          placeholder="Kelas"
+          value={filters.class_name}
+          onChange={(e) => setFilters({ ...filters, class_name: e.target.value })}
+          onKeyDown={(e) => e.key === 'Enter' && fetchResults()}
+          onBlur={() => fetchResults()}
+          data-testid="results-class-filter"
+        />
+      </div>
+
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6 mb-8">
         <div className="bg-white rounded-2xl shadow-lg p-6" data-testid="stat-total-submissions">
           <div className="bg-gradient-to-br from-blue-400 to-blue-600 w-14 h-14 rounded-full flex items-center justify-center mb-4">
@@ -132,6 +202,18 @@ const ResultsViewer = () => {
               </tbody>
             </table>
           </div>
+          {nextCursor && (
+            <div className="p-4 text-center border-t">
+              <Button
+                variant="outline"
+                onClick={() => fetchResults(nextCursor)}
+                disabled={loadingMore}
+                data-testid="results-load-more"
+              >
+                {loadingMore ? 'Memuat...' : 'Muat lebih banyak'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
     </div>
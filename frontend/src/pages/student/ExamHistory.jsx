@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { toast } from 'sonner';
+import { Button } from '@/components/ui/button';
 import { Clock, Award, CheckCircle } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -9,19 +10,25 @@ const API = `${BACKEND_URL}/api`;
 const ExamHistory = () => {
   const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchHistory();
   }, []);
 
-  const fetchHistory = async () => {
+  // History is paged; the next page is fetched only on "Muat lebih banyak"
+  const fetchHistory = async (after = null) => {
+    if (after) setLoadingMore(true);
     try {
-      const response = await axios.get(`${API}/exams/history`);
-      setHistory(response.data);
+      const response = await axios.get(`${API}/exams/history`, { params: after ? { after } : {} });
+      setHistory(after ? (prev) => prev.concat(response.data) : response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       toast.error('Gagal memuat riwayat');
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -97,6 +104,18 @@ const ExamHistory = () => {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <div className="text-center">
+              <Button
+                variant="outline"
+                onClick={() => fetchHistory(nextCursor)}
+                disabled={loadingMore}
+                data-testid="history-load-more"
+              >
+                {loadingMore ? 'Memuat...' : 'Muat lebih banyak'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
     </div>